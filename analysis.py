@@ -0,0 +1,114 @@
+
+import time
+
+import numpy as np
+
+CHECKPOINT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def summarize_paths(net_worth, margin_calls):
+    """
+    Reduces full simulation paths to a compact set of statistics.
+
+    Args:
+        net_worth (np.ndarray): (num_simulations, num_months) net worth paths.
+        margin_calls (np.ndarray): Boolean array of the same shape marking forced sales.
+
+    Returns:
+        dict: A dictionary containing:
+            - num_simulations (int): The number of simulated scenarios.
+            - num_months (int): The simulated horizon in months.
+            - ruin_probability (float): Share of scenarios whose net worth drops
+              to zero or below at any point.
+            - margin_call_scenario_share (float): Share of scenarios with at least
+              one forced sale.
+            - margin_calls_per_scenario_year (float): Average number of months with
+              a forced sale per scenario and year.
+            - yearly_checkpoints (list): One dict per year-end with the mean and the
+              ``CHECKPOINT_PERCENTILES`` of net worth across scenarios.
+    """
+    num_simulations, num_months = net_worth.shape
+    checkpoint_months = list(range(12, num_months + 1, 12))
+    if not checkpoint_months or checkpoint_months[-1] != num_months:
+        checkpoint_months.append(num_months)
+
+    columns = net_worth[:, np.array(checkpoint_months) - 1]
+    percentiles = np.percentile(columns, CHECKPOINT_PERCENTILES, axis=0)
+    means = columns.mean(axis=0)
+    yearly_checkpoints = []
+    for i, month in enumerate(checkpoint_months):
+        checkpoint = {'month': month, 'mean': float(means[i])}
+        for p, value in zip(CHECKPOINT_PERCENTILES, percentiles[:, i]):
+            checkpoint[f'p{p}'] = float(value)
+        yearly_checkpoints.append(checkpoint)
+
+    return {
+        'num_simulations': int(num_simulations),
+        'num_months': int(num_months),
+        'ruin_probability': float(1 - np.mean(np.all(net_worth > 0, axis=1))),
+        'margin_call_scenario_share': float(np.mean(margin_calls.any(axis=1))),
+        'margin_calls_per_scenario_year': float(margin_calls.sum(axis=1).mean() / (num_months / 12)),
+        'yearly_checkpoints': yearly_checkpoints,
+    }
+
+
+def _format_dollars(value):
+    return f"-${-value:,.0f}" if value < 0 else f"${value:,.0f}"
+
+
+def format_summary(summary):
+    """
+    Formats the statistics from ``summarize_paths`` as a short plain-text report.
+    """
+    lines = [
+        f"- Scenarios simulated: {summary['num_simulations']:,} over {summary['num_months']} months",
+        f"- Probability of ruin (net worth <= $0 at any point): {summary['ruin_probability']:.1%}",
+        f"- Scenarios with at least one forced sale (margin call): {summary['margin_call_scenario_share']:.1%}",
+        f"- Average forced-sale months per scenario per year: {summary['margin_calls_per_scenario_year']:.2f}",
+        "",
+        "Net worth at each year-end across scenarios:",
+        "Month | Mean | " + " | ".join(f"P{p}" for p in CHECKPOINT_PERCENTILES),
+    ]
+    for checkpoint in summary['yearly_checkpoints']:
+        values = [checkpoint['mean']] + [checkpoint[f'p{p}'] for p in CHECKPOINT_PERCENTILES]
+        lines.append(f"{checkpoint['month']} | " + " | ".join(_format_dollars(v) for v in values))
+    return "\n".join(lines)
+
+
+class GeminiClient:
+    """
+    Text generation client backed by the Gemini API.
+
+    Any object with a ``generate(prompt) -> str`` method can be used in its place,
+    for example a local stub in tests.
+    """
+
+    def __init__(self, api_key, model_name='gemini-2.5-pro'):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self._model.generate_content(prompt).text
+
+
+def request_analysis(client, prompt):
+    """
+    Sends a prompt to an LLM client and records the prompt size and latency.
+
+    Args:
+        client: An object with a ``generate(prompt) -> str`` method.
+        prompt (str): The full prompt.
+
+    Returns:
+        dict: A dictionary containing:
+            - text (str): The generated analysis.
+            - prompt_chars (int): The length of the prompt in characters.
+            - latency_seconds (float): The time spent waiting for the client.
+    """
+    start = time.perf_counter()
+    text = client.generate(prompt)
+    latency_seconds = time.perf_counter() - start
+    print(f"[Analysis] Prompt size: {len(prompt):,} chars, latency: {latency_seconds:.2f}s")
+    return {'text': text, 'prompt_chars': len(prompt), 'latency_seconds': latency_seconds}
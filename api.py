@@ -1,10 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List, Optional
 import json # Import json module for pretty printing
+import os
 
 # Assuming simulation.py is in the same directory or accessible via PYTHONPATH
-from simulation import run_simulation
+from simulation import aggregate_net_worth, run_simulation
+from solver import solve_spending
+from sensitivity import run_sensitivity
+from portfolio import simulate_portfolio
+from distributed import run_distributed, worker_authkey
 
 # Create the FastAPI app instance
 app = FastAPI(
@@ -47,6 +52,7 @@ class SimulationInput(BaseModel):
     return_distribution_df: float = Field(5, gt=2, description="Degrees of Freedom for Student's t distribution (returns).")
     interest_rate_distribution_model: str = Field('Normal', pattern="^(Normal|Student's t|Laplace)$")
     interest_rate_distribution_df: float = Field(5, gt=2, description="Degrees of Freedom for Student's t distribution (interest rates).")
+    seed: Optional[int] = Field(None, ge=0, description="Optional random seed for reproducible results.")
 
 class SimulationOutput(BaseModel):
     """
@@ -56,6 +62,83 @@ class SimulationOutput(BaseModel):
     avg_net_worth: List[float]
     min_net_worth: List[float]
 
+class AssetInput(BaseModel):
+    """
+    Defines one asset of a multi-asset portfolio.
+    """
+    name: str = Field(..., description="A label for the asset, e.g. its ticker.")
+    initial_value: float = Field(..., ge=0, description="The starting value of the position.")
+    initial_cost_basis: float = Field(..., ge=0, description="The original value of the position for tax purposes.")
+    annual_return: float = Field(..., description="The expected average annual return of the asset.")
+    annual_std_dev: float = Field(..., gt=0, description="The annualized standard deviation of the asset's returns.")
+    quarterly_dividend_yield: float = Field(0, ge=0, description="Quarterly dividend yield of the asset.")
+
+class PortfolioSimulationInput(SimulationInput):
+    """
+    Defines the simulation inputs for a portfolio of correlated assets tracked lot by lot.
+    """
+    assets: List[AssetInput] = Field(default_factory=list, description="The assets held. Defaults to the single-asset portfolio described by the other fields.")
+    asset_correlation: Optional[List[List[float]]] = Field(None, description="The correlation matrix of asset returns. Defaults to uncorrelated assets.")
+
+class SpendingSolverInput(SimulationInput):
+    """
+    Defines the simulation inputs plus the target used to solve for the maximum annual spending.
+    """
+    target_survival_probability: float = Field(0.9, gt=0, le=1, description="The required share of scenarios whose net worth stays positive.")
+    terminal_wealth_percentile: Optional[float] = Field(None, ge=0, le=100, description="If set, constrain this percentile of final net worth instead of the survival probability.")
+    target_terminal_wealth: float = Field(0, description="The minimum final net worth required at the chosen percentile.")
+    tolerance: float = Field(100, gt=0, description="The precision, in dollars, of the solved annual spending.")
+
+class SpendingSolverOutput(BaseModel):
+    """
+    Defines the structure for the spending solver results sent back to the client.
+    """
+    annual_spending: float
+    survival_probability: float
+    terminal_wealth: Optional[float]
+    iterations: int
+    feasible: bool
+
+class SensitivityInput(SimulationInput):
+    """
+    Defines the simulation inputs plus the perturbation settings for a sensitivity analysis.
+    """
+    parameters: Optional[List[str]] = Field(None, description="The inputs to perturb. Defaults to every strategy and market input.")
+    relative_step: float = Field(0.1, gt=0, lt=1, description="The relative size of the up and down perturbation of each input.")
+
+class ParameterSensitivity(BaseModel):
+    """
+    Defines the outcome of perturbing a single input.
+    """
+    parameter: str
+    base_value: float
+    low_value: float
+    high_value: float
+    ruin_probability_low: float
+    ruin_probability_high: float
+    median_terminal_net_worth_low: float
+    median_terminal_net_worth_high: float
+    ruin_probability_sensitivity: float
+    median_terminal_net_worth_sensitivity: float
+
+class SensitivityOutput(BaseModel):
+    """
+    Defines the structure for the sensitivity results, sorted for a tornado chart.
+    """
+    base_ruin_probability: float
+    base_median_terminal_net_worth: float
+    sensitivities: List[ParameterSensitivity]
+
+class DistributedSimulationOutput(SimulationOutput):
+    """
+    Defines the merged results of a simulation sharded across workers.
+    """
+    ruin_probability: float
+    margin_call_scenario_share: float
+    terminal_net_worth_percentiles: Dict[int, float]
+    num_simulations: int
+    seed: int
+
 # --- API Endpoint ---
 
 @app.post("/simulate", response_model=SimulationOutput)
@@ -81,4 +164,100 @@ async def create_simulation(inputs: SimulationInput) -> SimulationOutput:
     print(f"[API] Prepared response data keys: {response_data.keys()}")
     print(f"[API] Length of prepared avg_net_worth: {len(response_data['avg_net_worth'])}")
     
-    return SimulationOutput(**response_data)
\ No newline at end of file
+    return SimulationOutput(**response_data)
+
+@app.post("/solve/spending", response_model=SpendingSolverOutput)
+def solve_annual_spending(inputs: SpendingSolverInput) -> SpendingSolverOutput:
+    """
+    Finds the maximum annual spending that meets the requested survival or terminal wealth target.
+    """
+    inputs_dict = inputs.dict()
+    print(f"[API] Received solver inputs: {json.dumps(inputs_dict, indent=2)}")
+
+    solution = solve_spending(
+        inputs_dict,
+        target_survival_probability=inputs.target_survival_probability,
+        terminal_wealth_percentile=inputs.terminal_wealth_percentile,
+        target_terminal_wealth=inputs.target_terminal_wealth,
+        tolerance=inputs.tolerance,
+    )
+    print(f"[API] Solved annual spending: {solution['annual_spending']:,.2f} in {solution['iterations']} iterations")
+
+    return SpendingSolverOutput(**solution)
+
+@app.post("/sensitivity", response_model=SensitivityOutput)
+def create_sensitivity_analysis(inputs: SensitivityInput) -> SensitivityOutput:
+    """
+    Perturbs each input up and down on common random draws and reports the change in outcomes.
+    """
+    inputs_dict = inputs.dict()
+    print(f"[API] Received sensitivity inputs: {json.dumps(inputs_dict, indent=2)}")
+
+    try:
+        analysis = run_sensitivity(
+            inputs_dict,
+            parameters=inputs.parameters,
+            relative_step=inputs.relative_step,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    print(f"[API] Computed sensitivities for {len(analysis['sensitivities'])} parameters")
+
+    return SensitivityOutput(**analysis)
+
+@app.post("/simulate/portfolio", response_model=SimulationOutput)
+def create_portfolio_simulation(inputs: PortfolioSimulationInput) -> SimulationOutput:
+    """
+    Runs the retirement simulation on a multi-asset portfolio with per-lot cost basis tracking.
+    """
+    inputs_dict = inputs.dict()
+    print(f"[API] Received portfolio inputs: {json.dumps(inputs_dict, indent=2)}")
+
+    try:
+        paths = simulate_portfolio(inputs_dict)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results, _ = aggregate_net_worth(paths['net_worth'])
+
+    return SimulationOutput(
+        max_net_worth=results['max_net_worth'].tolist(),
+        avg_net_worth=results['avg_net_worth'].tolist(),
+        min_net_worth=results['min_net_worth'].tolist(),
+    )
+
+def _configured_workers():
+    """ Reads worker addresses from SIM_WORKERS, e.g. "127.0.0.1:6000,127.0.0.1:6001". """
+    workers = []
+    for address in os.environ.get('SIM_WORKERS', '').split(','):
+        if address.strip():
+            host, port = address.strip().rsplit(':', 1)
+            workers.append((host, int(port)))
+    return workers
+
+# Fail at startup, not on the first request, when workers are configured without a shared secret
+WORKER_AUTHKEY = worker_authkey() if _configured_workers() else None
+
+@app.post("/simulate/distributed", response_model=DistributedSimulationOutput)
+def create_distributed_simulation(inputs: SimulationInput) -> DistributedSimulationOutput:
+    """
+    Runs the retirement simulation in seed-range chunks on the workers listed in SIM_WORKERS.
+    """
+    inputs_dict = inputs.dict()
+    workers = _configured_workers()
+    print(f"[API] Received distributed inputs for {len(workers)} workers: {json.dumps(inputs_dict, indent=2)}")
+
+    try:
+        results = run_distributed(inputs_dict, workers=workers, authkey=WORKER_AUTHKEY)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return DistributedSimulationOutput(
+        max_net_worth=results['max_net_worth'].tolist(),
+        avg_net_worth=results['avg_net_worth'].tolist(),
+        min_net_worth=results['min_net_worth'].tolist(),
+        ruin_probability=results['ruin_probability'],
+        margin_call_scenario_share=results['margin_call_scenario_share'],
+        terminal_net_worth_percentiles=results['terminal_net_worth_percentiles'],
+        num_simulations=results['num_simulations'],
+        seed=results['seed'],
+    )
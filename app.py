@@ -1,9 +1,45 @@
 import gradio as gr
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from simulation import run_simulation
-import google.generativeai as genai
+from simulation import aggregate_net_worth, reuse_or_generate_draws, simulate_paths
+from analysis import GeminiClient, format_summary, request_analysis, summarize_paths
+
+
+MAX_PLOT_POINTS = 240
+PLOT_SERIES = {
+    'Max Net Worth': 'max_net_worth',
+    'Average Net Worth': 'avg_net_worth',
+    'Min Net Worth': 'min_net_worth',
+}
+PLOT_COLORS = {
+    'Max Net Worth': '#ffa600',
+    'Average Net Worth': '#003f5c',
+    'Min Net Worth': '#ff6361',
+}
+
+
+def downsample_indices(length, max_points=MAX_PLOT_POINTS):
+    """
+    Returns evenly spaced indices into a series, always keeping the first and last points.
+    """
+    if length <= max_points:
+        return np.arange(length)
+    return np.unique(np.linspace(0, length - 1, max_points).round().astype(int))
+
+
+def build_plot_data(months, results, max_points=MAX_PLOT_POINTS):
+    """
+    Builds a compact long-format table of the net worth series for gr.LinePlot.
+
+    Long horizons are downsampled to at most ``max_points`` points per series so
+    the payload sent to the browser stays small.
+    """
+    idx = downsample_indices(len(months), max_points)
+    return pd.DataFrame({
+        'Month': np.tile(months[idx], len(PLOT_SERIES)),
+        'Net Worth': np.concatenate([np.asarray(results[key])[idx] for key in PLOT_SERIES.values()]),
+        'Series': np.repeat(list(PLOT_SERIES), len(idx)),
+    })
 
 
 def run_and_display_simulation(
@@ -13,10 +49,16 @@ def run_and_display_simulation(
     margin_limit, simulation_count, tax_harvesting_profit_threshold,
     # New Distribution Inputs
     return_dist_model, return_dist_df,
-    interest_rate_dist_model, interest_rate_dist_df
+    interest_rate_dist_model, interest_rate_dist_df,
+    # Per-session cache of the last random draws
+    draw_cache=None
 ):
     """
     Runs the simulation and formats the output for the Gradio interface.
+
+    The random draws from the previous run are re-used while the distribution
+    settings and simulation count are unchanged, so editing strategy inputs
+    only re-runs the deterministic state machine.
     """
     inputs = {
         'initial_portfolio_value': initial_portfolio_value,
@@ -39,7 +81,10 @@ def run_and_display_simulation(
         'interest_rate_distribution_df': interest_rate_dist_df
     }
 
-    results, _ = run_simulation(inputs)
+    draw_cache = reuse_or_generate_draws(inputs, draw_cache)
+    paths = simulate_paths(inputs, draw_cache['draws'])
+    results, _ = aggregate_net_worth(paths['net_worth'])
+    simulation_stats = summarize_paths(paths['net_worth'], paths['margin_calls'])
 
     # --- Create Summary ---
     stop_month = -1
@@ -57,64 +102,69 @@ def run_and_display_simulation(
         summary_text = f"The average net worth after 10 years is **${final_avg_net_worth:,.0f}**."
 
     # --- Create Plot ---
-    fig, ax = plt.subplots(figsize=(10, 6))
-    months = range(1, len(results['avg_net_worth']) + 1)
-    ax.plot(months, results['max_net_worth'],
-            label='Max Net Worth', color='#ffa600')
-    ax.plot(months, results['avg_net_worth'],
-            label='Average Net Worth', color='#003f5c', linewidth=2)
-    ax.plot(months, results['min_net_worth'],
-            label='Min Net Worth', color='#ff6361')
-    ax.fill_between(months, results['min_net_worth'],
-                    results['max_net_worth'], color='gray', alpha=0.1)
-    ax.set_title('Simulated Net Worth Over 10 Years', fontsize=16)
-    ax.set_xlabel('Month')
-    ax.set_ylabel('Net Worth ($)')
-    ax.legend()
-    ax.grid(True, linestyle='--', alpha=0.6)
-    ax.yaxis.set_major_formatter(
-        plt.FuncFormatter(lambda x, p: f'${x/1000:,.0f}k'))
-    plt.tight_layout()
+    months = np.arange(1, len(results['avg_net_worth']) + 1)
+    plot_df = build_plot_data(months, results)
 
     # --- Create DataFrame ---
+    # Values stay numeric; the currency format is applied for display only
     df = pd.DataFrame({
         'Month': months,
         'Min Net Worth': results['min_net_worth'],
         'Avg Net Worth': results['avg_net_worth'],
         'Max Net Worth': results['max_net_worth']
     })
-
-    for col in ['Min Net Worth', 'Avg Net Worth', 'Max Net Worth']:
-        df[col] = df[col].map('${:,.2f}'.format)
+    styled_df = df.style.format(
+        '${:,.2f}', subset=['Min Net Worth', 'Avg Net Worth', 'Max Net Worth'])
 
     return (
         gr.update(visible=True),
         summary_title,
         summary_text,
-        fig,
-        df,
+        plot_df,
+        styled_df,
+        gr.update(open=True),
         gr.update(open=True),
-        gr.update(open=True)
+        draw_cache,
+        simulation_stats
     )
 
 
+def rerun_with_cached_draws(*args):
+    """
+    Re-runs the simulation after a strategy input is edited, using the cached draws.
+
+    Takes the same arguments as ``run_and_display_simulation``. Nothing is
+    updated until a first run has filled the draw cache, or while an input
+    is empty mid-edit.
+    """
+    draw_cache = args[-1]
+    if draw_cache is None or any(value is None for value in args[:-1]):
+        return (gr.skip(),) * 9
+    return run_and_display_simulation(*args)
+
+
 def get_gemini_analysis(
     # API Key and results
-    api_key, summary_text, df,
+    api_key, summary_text, simulation_stats,
     # Core Inputs
     initial_portfolio_value, initial_cost_basis, annual_spending,
     annual_return, annual_std_dev, margin_rate, margin_rate_std_dev,
     margin_limit, simulation_count, tax_harvesting_profit_threshold,
     # Distribution Inputs
     return_dist_model, return_dist_df,
-    interest_rate_dist_model, interest_rate_dist_df
+    interest_rate_dist_model, interest_rate_dist_df,
+    # Optional LLM client, e.g. a local stub; defaults to Gemini
+    client=None
 ):
     """
     Analyzes the simulation results using the Gemini Pro API.
+
+    Only compact statistics (year-end percentiles, ruin probability and
+    margin-call frequency) are sent, not the full monthly table.
     """
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-pro')
+        if client is None:
+            client = GeminiClient(api_key)
 
         system_prompt = '''
         You are a helpful financial analyst assistant. Your role is to provide a clear, concise, and neutral interpretation of Monte Carlo simulation results for a retirement plan.
@@ -167,14 +217,13 @@ def get_gemini_analysis(
         **Simulation Results Summary:**
         {summary_text}
 
-        **Detailed Monthly Data:**
-        {df.to_string()}
+        **Simulation Statistics:**
+        {format_summary(simulation_stats)}
         """
 
         prompt = f"{system_prompt}\n\n{user_query}"
 
-        response = model.generate_content(prompt)
-        return response.text
+        return request_analysis(client, prompt)['text']
     except Exception as e:
         return f"An error occurred: {e}"
 
@@ -208,7 +257,7 @@ with gr.Blocks(
     )
 
     with gr.Accordion("Step 1: The Starting Point - Your Financial DNA", open=True):
-        gr.Markdown("<p style='text-align: center; font-size: 1.1rem; font-family: Inter, sans-serif;'>The simulation begins with your unique parameters. Change any value below and run the simulation to see how it impacts your 10-year outlook.</p>")
+        gr.Markdown("<p style='text-align: center; font-size: 1.1rem; font-family: Inter, sans-serif;'>The simulation begins with your unique parameters. Change any value below and run the simulation to see how it impacts your 10-year outlook. After the first run, edits to the strategy values update the results as soon as you press Enter or leave the field.</p>")
         with gr.Row():
             initial_portfolio_value = gr.Number(value=1000000, label="PORTFOLIO VALUE ($)",
                                                 elem_classes="input-card", info="The starting value of your investment portfolio.")
@@ -341,10 +390,11 @@ with gr.Blocks(
         with gr.Group() as summary_card:
             summary_title_output = gr.Markdown()
             summary_text_output = gr.Markdown()
-        plot_output = gr.Plot()
+        plot_output = gr.LinePlot(x='Month', y='Net Worth', color='Series', color_map=PLOT_COLORS,
+                                  title='Simulated Net Worth Over 10 Years', x_title='Month', y_title='Net Worth ($)')
         with gr.Accordion("View Monthly Data", open=False) as monthly_data_accordion:
             dataframe_output = gr.Dataframe(headers=["Month", "Min Net Worth", "Avg Net Worth", "Max Net Worth"], datatype=[
-                                            "number", "str", "str", "str"])
+                                            "number", "number", "number", "number"])
 
         with gr.Accordion("Get Gemini Analysis", open=False) as gemini_analysis_accordion:
             gemini_key = gr.Textbox(
@@ -352,6 +402,9 @@ with gr.Blocks(
             analyze_button = gr.Button("Analyze Results")
             gemini_analysis_output = gr.Markdown()
 
+    draw_cache = gr.State()
+    simulation_stats = gr.State()
+
     # --- Event Handlers ---
     def update_summary_style(summary_title):
         if "Survived" in summary_title:
@@ -366,25 +419,31 @@ with gr.Blocks(
     return_dist_model.change(toggle_df_slider, inputs=return_dist_model, outputs=return_dist_df)
     interest_rate_dist_model.change(toggle_df_slider, inputs=interest_rate_dist_model, outputs=interest_rate_dist_df)
 
+    simulation_inputs = [
+        initial_portfolio_value, initial_cost_basis, annual_spending,
+        annual_return, annual_std_dev, margin_rate, margin_rate_std_dev,
+        margin_limit, simulation_count, tax_harvesting_profit_threshold,
+        return_dist_model, return_dist_df,
+        interest_rate_dist_model, interest_rate_dist_df,
+        draw_cache
+    ]
+    simulation_outputs = [
+        results_box,
+        summary_title_output,
+        summary_text_output,
+        plot_output,
+        dataframe_output,
+        monthly_data_accordion,
+        gemini_analysis_accordion,
+        draw_cache,
+        simulation_stats
+    ]
+
     # Main simulation button
     run_button.click(
         fn=run_and_display_simulation,
-        inputs=[
-            initial_portfolio_value, initial_cost_basis, annual_spending,
-            annual_return, annual_std_dev, margin_rate, margin_rate_std_dev,
-            margin_limit, simulation_count, tax_harvesting_profit_threshold,
-            return_dist_model, return_dist_df,
-            interest_rate_dist_model, interest_rate_dist_df
-        ],
-        outputs=[
-            results_box,
-            summary_title_output,
-            summary_text_output,
-            plot_output,
-            dataframe_output,
-            monthly_data_accordion,
-            gemini_analysis_accordion
-        ],
+        inputs=simulation_inputs,
+        outputs=simulation_outputs,
         show_progress='full'
     ).then(
         fn=update_summary_style,
@@ -392,11 +451,30 @@ with gr.Blocks(
         outputs=summary_card
     )
 
+    # Strategy edits re-run only the state machine on the cached draws.
+    # Simulation count and distribution settings need new draws, so they wait for the button.
+    strategy_inputs = [
+        initial_portfolio_value, initial_cost_basis, annual_spending,
+        annual_return, annual_std_dev, margin_rate, margin_rate_std_dev,
+        margin_limit, tax_harvesting_profit_threshold,
+    ]
+    gr.on(
+        triggers=[component.submit for component in strategy_inputs] + [component.blur for component in strategy_inputs],
+        fn=rerun_with_cached_draws,
+        inputs=simulation_inputs,
+        outputs=simulation_outputs,
+        show_progress='minimal'
+    ).then(
+        fn=update_summary_style,
+        inputs=summary_title_output,
+        outputs=summary_card
+    )
+
     # Gemini analysis button
     analyze_button.click(
         fn=get_gemini_analysis,
         inputs=[
-            gemini_key, summary_text_output, dataframe_output,
+            gemini_key, summary_text_output, simulation_stats,
             initial_portfolio_value, initial_cost_basis, annual_spending,
             annual_return, annual_std_dev, margin_rate, margin_rate_std_dev,
             margin_limit, simulation_count, tax_harvesting_profit_threshold,
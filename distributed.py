@@ -0,0 +1,391 @@
+
+import argparse
+import math
+import multiprocessing
+import os
+import queue
+import threading
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from simulation import generate_draws, simulate_paths
+
+DEFAULT_CHUNK_SIZE = 250
+TERMINAL_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def worker_authkey():
+    """
+    Returns the shared worker secret from the SIM_WORKER_AUTHKEY environment variable.
+
+    Worker connections unpickle every message, so there is no default key.
+
+    Raises:
+        RuntimeError: If SIM_WORKER_AUTHKEY is not set.
+    """
+    authkey = os.environ.get('SIM_WORKER_AUTHKEY')
+    if not authkey:
+        raise RuntimeError("SIM_WORKER_AUTHKEY must be set to a shared secret for worker connections.")
+    return authkey.encode()
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error.
+
+    Values are counted in logarithmically spaced buckets, so any quantile is
+    returned within ``relative_accuracy`` of a true sample value. Merging only
+    adds integer counts, which makes the result independent of how the data
+    was split and in which order the pieces are merged.
+    """
+
+    def __init__(self, relative_accuracy=0.005):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        self.zero_count += int(np.count_nonzero(values == 0))
+        for store, magnitudes in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            if magnitudes.size:
+                keys, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(int), return_counts=True)
+                for key, count in zip(keys.tolist(), counts.tolist()):
+                    store[key] = store.get(key, 0) + count
+        self.count += values.size
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged.")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _bucket_value(self, key):
+        return 2 * self._gamma**key / (self._gamma + 1)
+
+    def quantile(self, q):
+        """ Returns the estimated q-quantile (0 <= q <= 1), or None for an empty sketch. """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'positive': self.positive,
+            'negative': self.negative,
+            'zero_count': self.zero_count,
+            'count': self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'])
+        sketch.positive = {int(key): count for key, count in data['positive'].items()}
+        sketch.negative = {int(key): count for key, count in data['negative'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        return sketch
+
+
+def plan_chunks(inputs, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Splits a simulation job into fixed seed-range chunks.
+
+    The chunks depend only on the inputs and ``chunk_size``, never on the
+    number of workers. Chunk ``k`` draws its scenarios from the seed
+    ``(seed, k)``.
+
+    Args:
+        inputs (dict): The simulation parameters. ``inputs['seed']`` must be set.
+        chunk_size (int): The number of scenarios per chunk.
+
+    Returns:
+        list: One task dictionary per chunk.
+    """
+    num_simulations = int(inputs['num_simulations'])
+    return [
+        {
+            'inputs': inputs,
+            'chunk_index': index,
+            'num_simulations': min(chunk_size, num_simulations - start),
+        }
+        for index, start in enumerate(range(0, num_simulations, chunk_size))
+    ]
+
+
+def compute_partial(task):
+    """
+    Simulates one chunk and reduces it to a mergeable partial aggregate.
+
+    Args:
+        task (dict): A task from ``plan_chunks``.
+
+    Returns:
+        dict: Per-month sums, minimums and maximums of net worth, survival and
+        margin-call counts, and a terminal net worth ``QuantileSketch`` as a dict.
+    """
+    inputs = {**task['inputs'], 'num_simulations': task['num_simulations']}
+    draws = generate_draws(inputs, seed=[int(inputs['seed']), task['chunk_index']])
+    paths = simulate_paths(inputs, draws)
+    net_worth = paths['net_worth']
+
+    sketch = QuantileSketch()
+    sketch.add(net_worth[:, -1])
+    return {
+        'chunk_index': task['chunk_index'],
+        'count': net_worth.shape[0],
+        'net_worth_sum': net_worth.sum(axis=0),
+        'net_worth_min': net_worth.min(axis=0),
+        'net_worth_max': net_worth.max(axis=0),
+        'survived': int(np.all(net_worth > 0, axis=1).sum()),
+        'margin_call_scenarios': int(paths['margin_calls'].any(axis=1).sum()),
+        'terminal_sketch': sketch.to_dict(),
+    }
+
+
+def merge_partials(partials):
+    """
+    Merges partial aggregates into the final results.
+
+    Partials are combined in chunk order, so floating point sums come out
+    bit-for-bit the same however the chunks were spread across workers.
+
+    Returns:
+        dict: A dictionary containing:
+            - max_net_worth, avg_net_worth, min_net_worth (np.ndarray): Monthly
+              aggregates across all scenarios.
+            - ruin_probability (float): Share of scenarios whose net worth drops
+              to zero or below at any point.
+            - margin_call_scenario_share (float): Share of scenarios with at least
+              one forced sale.
+            - terminal_net_worth_percentiles (dict): ``TERMINAL_PERCENTILES`` of
+              final net worth, estimated from the merged sketch.
+            - num_simulations (int): The total number of scenarios.
+    """
+    partials = sorted(partials, key=lambda partial: partial['chunk_index'])
+    count = 0
+    net_worth_sum = None
+    survived = 0
+    margin_call_scenarios = 0
+    sketch = None
+    for partial in partials:
+        count += partial['count']
+        survived += partial['survived']
+        margin_call_scenarios += partial['margin_call_scenarios']
+        partial_sketch = QuantileSketch.from_dict(partial['terminal_sketch'])
+        if net_worth_sum is None:
+            net_worth_sum = np.array(partial['net_worth_sum'], dtype=float)
+            net_worth_min = np.array(partial['net_worth_min'], dtype=float)
+            net_worth_max = np.array(partial['net_worth_max'], dtype=float)
+            sketch = partial_sketch
+        else:
+            net_worth_sum = net_worth_sum + partial['net_worth_sum']
+            net_worth_min = np.minimum(net_worth_min, partial['net_worth_min'])
+            net_worth_max = np.maximum(net_worth_max, partial['net_worth_max'])
+            sketch.merge(partial_sketch)
+
+    return {
+        'max_net_worth': net_worth_max,
+        'avg_net_worth': net_worth_sum / count,
+        'min_net_worth': net_worth_min,
+        'ruin_probability': 1 - survived / count,
+        'margin_call_scenario_share': margin_call_scenarios / count,
+        'terminal_net_worth_percentiles': {p: sketch.quantile(p / 100) for p in TERMINAL_PERCENTILES},
+        'num_simulations': count,
+    }
+
+
+def serve_worker(address, authkey, ready=None):
+    """
+    Runs a stateless worker that answers chunk tasks over a local socket.
+
+    Each connection sends task dictionaries and receives one reply per task
+    until it closes: ``{'partial': ...}`` on success or ``{'error': ...}`` if
+    the task raised, so a bad task never takes the worker down. A ``None``
+    task asks the worker to shut down.
+
+    Args:
+        address (tuple): The ``(host, port)`` to listen on. Port 0 picks a free port.
+        authkey (bytes): Shared secret used to authenticate the coordinator.
+        ready (multiprocessing.Queue, optional): Receives the bound address once listening.
+    """
+    with Listener(address, authkey=authkey) as listener:
+        if ready is not None:
+            ready.put(listener.address)
+        while True:
+            with listener.accept() as conn:
+                while True:
+                    try:
+                        task = conn.recv()
+                    except EOFError:
+                        break
+                    if task is None:
+                        return
+                    try:
+                        reply = {'partial': compute_partial(task)}
+                    except Exception as e:
+                        reply = {'error': f"{type(e).__name__}: {e}"}
+                    conn.send(reply)
+
+
+def run_distributed(inputs, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, authkey=None):
+    """
+    Coordinates a simulation across workers and merges their partial aggregates.
+
+    Without workers every chunk is computed in this process. The result is the
+    same in both cases, and for any number of workers, because the chunks and
+    the merge order do not depend on how the work is distributed. A random seed
+    is chosen when the inputs do not set one so the run can be reproduced.
+
+    Args:
+        inputs (dict): The simulation parameters.
+        workers (list, optional): ``(host, port)`` addresses of running workers.
+        chunk_size (int): The number of scenarios per chunk.
+        authkey (bytes, optional): Shared secret for the worker connections.
+            Defaults to ``worker_authkey()`` when workers are given.
+
+    Returns:
+        dict: The output of ``merge_partials`` plus the ``seed`` used.
+
+    Raises:
+        RuntimeError: If a task fails on a worker, every worker fails before
+            the job is finished, or no authkey is available for the workers.
+    """
+    if inputs.get('seed') is None:
+        inputs = {**inputs, 'seed': int(np.random.SeedSequence().entropy % 2**32)}
+    tasks = plan_chunks(inputs, chunk_size)
+
+    if not workers:
+        partials = [compute_partial(task) for task in tasks]
+    else:
+        if authkey is None:
+            authkey = worker_authkey()
+        pending = queue.Queue()
+        for task in tasks:
+            pending.put(task)
+        partials = []
+        errors = []
+        lock = threading.Lock()
+
+        def drive(address):
+            # Feed one worker until the queue is empty. A lost connection hands the
+            # task back to the others; a task that raised is reported, never retried.
+            try:
+                conn = Client(tuple(address), authkey=authkey)
+            except OSError:
+                return
+            with conn:
+                while True:
+                    with lock:
+                        if errors or len(partials) == len(tasks):
+                            return
+                    try:
+                        task = pending.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    try:
+                        conn.send(task)
+                        reply = conn.recv()
+                    except (OSError, EOFError):
+                        pending.put(task)
+                        return
+                    with lock:
+                        if 'error' in reply:
+                            errors.append(f"Chunk {task['chunk_index']} failed on worker {address}: {reply['error']}")
+                        else:
+                            partials.append(reply['partial'])
+
+        threads = [threading.Thread(target=drive, args=(address,)) for address in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise RuntimeError(errors[0])
+        if len(partials) != len(tasks):
+            raise RuntimeError("All workers failed before the simulation finished.")
+
+    results = merge_partials(partials)
+    results['seed'] = int(inputs['seed'])
+    return results
+
+
+class LocalCluster:
+    """
+    Starts worker processes on this machine, each listening on a free localhost port.
+
+    Use as a context manager; ``addresses`` and ``authkey`` can be passed to
+    ``run_distributed``. A fresh random key is generated unless one is given.
+    """
+
+    def __init__(self, num_workers, authkey=None):
+        self.num_workers = num_workers
+        self.authkey = authkey if authkey is not None else os.urandom(32)
+        self.addresses = []
+        self._processes = []
+
+    def __enter__(self):
+        context = multiprocessing.get_context('spawn')
+        ready = context.Queue()
+        for _ in range(self.num_workers):
+            process = context.Process(
+                target=serve_worker, args=(('127.0.0.1', 0), self.authkey, ready), daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        self.addresses = [ready.get(timeout=60) for _ in self._processes]
+        return self
+
+    def __exit__(self, *exc):
+        for address in self.addresses:
+            try:
+                with Client(address, authkey=self.authkey) as conn:
+                    conn.send(None)
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def main():
+    """
+    Command-line entry point: start a worker listening on a local socket.
+    """
+    parser = argparse.ArgumentParser(description="Run a retirement simulation worker.")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on.")
+    parser.add_argument('--port', type=int, default=6000, help="Port to listen on.")
+    args = parser.parse_args()
+    try:
+        authkey = worker_authkey()
+    except RuntimeError as e:
+        parser.error(str(e))
+    print(f"Worker listening on {args.host}:{args.port}")
+    serve_worker((args.host, args.port), authkey)
+
+
+if __name__ == '__main__':
+    main()
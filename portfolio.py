@@ -0,0 +1,297 @@
+
+import numpy as np
+
+from simulation import CA_TAX_RATE, NUM_MONTHS, _draw_standardized, _safe_ratio
+
+# One row per asset per lot. Lots are shared by every scenario, only their
+# value and cost basis differ, so those live in a (num_simulations, num_lots) array.
+LOT_DTYPE = np.dtype([('asset', 'i4'), ('acquired_month', 'i4')])
+HOLDING_DTYPE = np.dtype([('value', 'f8'), ('basis', 'f8')])
+
+LONG_TERM_MONTHS = 12
+
+
+def single_asset_portfolio(inputs):
+    """
+    Describes the classic single-asset inputs as a one-asset portfolio.
+
+    Args:
+        inputs (dict): The simulation parameters used by ``run_simulation``.
+
+    Returns:
+        list: A list with one asset dictionary for ``simulate_portfolio``.
+    """
+    return [{
+        'name': 'Portfolio',
+        'initial_value': inputs['initial_portfolio_value'],
+        'initial_cost_basis': inputs['initial_cost_basis'],
+        'annual_return': inputs['portfolio_annual_return'],
+        'annual_std_dev': inputs['portfolio_annual_std_dev'],
+        'quarterly_dividend_yield': inputs['quarterly_dividend_yield'],
+    }]
+
+
+def cholesky_factor(correlation, num_assets):
+    """
+    Returns the lower-triangular Cholesky factor of an asset correlation matrix.
+
+    Args:
+        correlation (list or np.ndarray, optional): A (num_assets, num_assets)
+            correlation matrix. Uncorrelated assets are assumed when omitted.
+        num_assets (int): The number of assets.
+
+    Raises:
+        ValueError: If the matrix has the wrong shape, is not symmetric with a
+            unit diagonal, or is not positive definite.
+    """
+    if correlation is None:
+        return np.eye(num_assets)
+    correlation = np.asarray(correlation, dtype=float)
+    if correlation.shape != (num_assets, num_assets):
+        raise ValueError(f"The correlation matrix must be {num_assets}x{num_assets}.")
+    if not np.allclose(correlation, correlation.T) or not np.allclose(np.diag(correlation), 1):
+        raise ValueError("The correlation matrix must be symmetric with ones on the diagonal.")
+    try:
+        return np.linalg.cholesky(correlation)
+    except np.linalg.LinAlgError:
+        raise ValueError("The correlation matrix must be positive definite.")
+
+
+def generate_portfolio_draws(inputs, num_assets, num_months=NUM_MONTHS, seed=None):
+    """
+    Pre-generates correlated return shocks for every asset plus the margin rate shocks.
+
+    Independent standardized shocks are drawn from the chosen return
+    distribution and mixed with the Cholesky factor of
+    ``inputs['asset_correlation']``, which keeps unit variance and gives the
+    requested correlation between assets.
+
+    Returns:
+        dict: A dictionary containing:
+            - return_shocks (np.ndarray): (num_simulations, num_months, num_assets)
+              correlated standardized monthly return shocks.
+            - rate_shocks (np.ndarray): (num_simulations, num_years) standardized
+              annual margin rate shocks.
+    """
+    if seed is None:
+        seed = inputs.get('seed')
+    rng = np.random.default_rng(seed)
+    num_simulations = int(inputs['num_simulations'])
+    num_years = -(-num_months // 12)
+    factor = cholesky_factor(inputs.get('asset_correlation'), num_assets)
+
+    rate_shocks = _draw_standardized(
+        inputs.get('interest_rate_distribution_model', 'Normal'),
+        (num_simulations, num_years),
+        inputs.get('interest_rate_distribution_df', 5),
+        rng
+    )
+    independent_shocks = _draw_standardized(
+        inputs.get('return_distribution_model', 'Normal'),
+        (num_simulations, num_months, num_assets),
+        inputs.get('return_distribution_df', 5),
+        rng
+    )
+    return {'return_shocks': independent_shocks @ factor.T, 'rate_shocks': rate_shocks}
+
+
+def _build_lots(num_assets, num_years):
+    """
+    Lays out the lot table: the initial lots first, then one lot per asset per year-end harvest.
+
+    Initial holdings are treated as long-term from the start.
+    """
+    lots = np.zeros(num_assets * (num_years + 1), dtype=LOT_DTYPE)
+    lots['asset'] = np.tile(np.arange(num_assets), num_years + 1)
+    lots['acquired_month'] = np.repeat(np.arange(num_years + 1) * 12, num_assets)
+    lots['acquired_month'][:num_assets] = -LONG_TERM_MONTHS
+    return lots
+
+
+def _sell_in_order(values, amounts, order):
+    """
+    Sells ``amounts`` from each row of ``values`` following the lot ``order``.
+
+    Returns:
+        np.ndarray: The amount sold from every lot, in the original lot order.
+    """
+    sorted_values = np.maximum(np.take_along_axis(values, order, axis=1), 0.0)
+    sold_before = np.cumsum(sorted_values, axis=1) - sorted_values
+    sorted_sales = np.clip(amounts[:, None] - sold_before, 0.0, sorted_values)
+    sales = np.empty_like(sorted_sales)
+    np.put_along_axis(sales, order, sorted_sales, axis=1)
+    return sales
+
+
+def simulate_portfolio(inputs, draws=None):
+    """
+    Runs the retirement state machine on a multi-asset, multi-lot portfolio.
+
+    Holdings are tracked per asset per lot with their own cost basis. A lot
+    becomes long-term 12 months after it is acquired. Forced sales sell
+    long-term lots before short-term ones and, within each group, the lots
+    with the highest cost basis first to keep realized gains low. Year-end
+    harvesting sells the long-term lots whose unrealized gain exceeds
+    ``tax_harvesting_profit_threshold``, largest gain first, until the federal
+    tax-free limit is used, and re-buys each asset as a new lot.
+
+    Args:
+        inputs (dict): The simulation parameters. ``inputs['assets']`` lists the
+            assets (see ``single_asset_portfolio`` for the keys) and the optional
+            ``inputs['asset_correlation']`` gives their return correlation. The
+            single-asset inputs are used when no assets are given.
+        draws (dict, optional): Pre-generated draws from ``generate_portfolio_draws``.
+
+    Returns:
+        dict: A dictionary containing:
+            - net_worth (np.ndarray): (num_simulations, num_months) monthly net worth.
+            - margin_calls (np.ndarray): Boolean array of the same shape, True in
+              the months where a forced sale took place.
+            - lots (np.ndarray): The lot table with ``LOT_DTYPE``.
+            - holdings (np.ndarray): Final (num_simulations, num_lots) holdings
+              with ``HOLDING_DTYPE``.
+    """
+    assets = inputs.get('assets') or single_asset_portfolio(inputs)
+    num_assets = len(assets)
+    if draws is None:
+        draws = generate_portfolio_draws(inputs, num_assets)
+    return_shocks = draws['return_shocks']
+    rate_shocks = draws['rate_shocks']
+    num_simulations, num_months, _ = return_shocks.shape
+    num_years = -(-num_months // 12)
+
+    # Extract inputs from the dictionary
+    annual_return = np.array([asset['annual_return'] for asset in assets], dtype=float)
+    annual_std_dev = np.array([asset['annual_std_dev'] for asset in assets], dtype=float)
+    quarterly_dividend_yield = np.array([asset['quarterly_dividend_yield'] for asset in assets], dtype=float)
+    monthly_spending = inputs['annual_spending'] / 12
+    monthly_passive_income = inputs['monthly_passive_income']
+    margin_loan_annual_avg_interest_rate = inputs['margin_loan_annual_avg_interest_rate']
+    margin_loan_annual_interest_rate_std_dev = inputs['margin_loan_annual_interest_rate_std_dev']
+    brokerage_margin_limit = inputs['brokerage_margin_limit']
+    federal_tax_free_gain_limit = inputs['federal_tax_free_gain_limit']
+    tax_harvesting_profit_threshold = inputs['tax_harvesting_profit_threshold']
+
+    # --- Simulation setup ---
+    monthly_return = (1 + annual_return)**(1/12) - 1
+    monthly_std_dev = annual_std_dev / np.sqrt(12)
+    cash_shortfall = monthly_spending - monthly_passive_income
+
+    lots = _build_lots(num_assets, num_years)
+    lot_asset = lots['asset']
+    asset_one_hot = np.eye(num_assets)[lot_asset]
+
+    # --- Initialize scenario variables ---
+    holdings = np.zeros((num_simulations, len(lots)), dtype=HOLDING_DTYPE)
+    value = holdings['value']
+    basis = holdings['basis']
+    value[:, :num_assets] = [asset['initial_value'] for asset in assets]
+    basis[:, :num_assets] = [asset['initial_cost_basis'] for asset in assets]
+    margin_loan = np.zeros(num_simulations)
+
+    total_margin_interest_paid_this_year = np.zeros(num_simulations)
+    gains_realized_this_year = np.zeros(num_simulations)
+    total_dividend_income_this_year = np.zeros(num_simulations)
+
+    current_annual_margin_rate = (
+        margin_loan_annual_avg_interest_rate
+        + margin_loan_annual_interest_rate_std_dev * rate_shocks[:, 0]
+    )
+
+    net_worth = np.empty((num_simulations, num_months))
+    margin_calls = np.zeros((num_simulations, num_months), dtype=bool)
+
+    for month in range(1, num_months + 1):
+        # Only lots created so far can hold a position
+        active = num_assets * (1 + (month - 1) // 12)
+        is_long_term = (month - lots['acquired_month'][:active]) >= LONG_TERM_MONTHS
+
+        # Step 1: Calculate Correlated Market Returns & Update Lots
+        growth = 1 + monthly_return + monthly_std_dev * return_shocks[:, month - 1, :]
+        value[:, :active] *= growth[:, lot_asset[:active]]
+
+        # Step 2: Handle Quarterly Dividends
+        if month % 3 == 0:
+            dividend_payment = value[:, :active] @ quarterly_dividend_yield[lot_asset[:active]]
+            margin_loan -= dividend_payment
+            total_dividend_income_this_year += dividend_payment
+
+        # Step 3: Cover Expenses & Update Margin Loan
+        margin_loan += cash_shortfall
+        monthly_margin_interest = margin_loan * (current_annual_margin_rate / 12)
+        margin_loan += monthly_margin_interest
+        total_margin_interest_paid_this_year += monthly_margin_interest
+
+        # Step 4: Check for Forced Selling (Deleveraging)
+        total_portfolio_value = value[:, :active].sum(axis=1)
+        margin_limit = total_portfolio_value * brokerage_margin_limit
+        margin_call = margin_loan > margin_limit
+        margin_calls[:, month - 1] = margin_call
+        if margin_call.any():
+            rows = np.nonzero(margin_call)[0]
+            lot_values = value[rows, :active]
+            lot_basis = basis[rows, :active]
+            amount_to_sell = (margin_loan[rows] - margin_limit[rows]) / (1 - brokerage_margin_limit)
+            # Long-term lots first, then the highest cost basis per dollar of value
+            order = np.lexsort((
+                -_safe_ratio(lot_basis, lot_values),
+                np.broadcast_to(~is_long_term, lot_values.shape)
+            ), axis=-1)
+            sales = _sell_in_order(lot_values, amount_to_sell, order)
+            sold_fraction = _safe_ratio(sales, lot_values)
+            gains_realized_this_year[rows] += (sold_fraction * (lot_values - lot_basis)).sum(axis=1)
+            basis[rows, :active] = lot_basis - sold_fraction * lot_basis
+            value[rows, :active] = lot_values - sales
+            margin_loan[rows] -= sales.sum(axis=1)
+
+        # Step 5: Execute End-of-Year Tax Strategy
+        if month % 12 == 0:
+            lot_values = value[:, :active]
+            lot_basis = basis[:, :active]
+            unrealized_gain = lot_values - lot_basis
+            unrealized_gain_percentage = _safe_ratio(unrealized_gain, lot_values)
+            eligible = is_long_term & (unrealized_gain_percentage > tax_harvesting_profit_threshold)
+            eligible_gain = np.where(eligible, unrealized_gain, 0.0)
+
+            gains_to_harvest = np.maximum(
+                federal_tax_free_gain_limit - (gains_realized_this_year + total_dividend_income_this_year), 0.0
+            )
+            # Harvest the lots with the largest unrealized gain percentage first
+            order = np.argsort(-np.where(eligible, unrealized_gain_percentage, -np.inf), axis=1)
+            realized_gain = _sell_in_order(eligible_gain, gains_to_harvest, order)
+            harvested_fraction = _safe_ratio(realized_gain, eligible_gain)
+            harvested_value = harvested_fraction * lot_values
+            value[:, :active] = lot_values - harvested_value
+            basis[:, :active] = lot_basis - harvested_fraction * lot_basis
+            gains_realized_this_year += realized_gain.sum(axis=1)
+
+            # Re-buy immediately at a stepped-up basis as this year's lot of each asset
+            repurchased = harvested_value @ asset_one_hot[:active]
+            new_lots = slice(num_assets * (month // 12), num_assets * (month // 12 + 1))
+            value[:, new_lots] += repurchased
+            basis[:, new_lots] += repurchased
+
+            # Calculate and "Pay" California Tax
+            total_investment_income = gains_realized_this_year + total_dividend_income_this_year
+            net_investment_income = total_investment_income - total_margin_interest_paid_this_year
+            margin_loan += net_investment_income * CA_TAX_RATE
+
+            # Reset annual counters and set new margin rate
+            total_margin_interest_paid_this_year[:] = 0
+            gains_realized_this_year[:] = 0
+            total_dividend_income_this_year[:] = 0
+            if month // 12 < rate_shocks.shape[1]:
+                current_annual_margin_rate = (
+                    margin_loan_annual_avg_interest_rate
+                    + margin_loan_annual_interest_rate_std_dev * rate_shocks[:, month // 12]
+                )
+
+        # Step 6: Record Net Worth
+        net_worth[:, month - 1] = value.sum(axis=1) - margin_loan
+
+    return {
+        'net_worth': net_worth,
+        'margin_calls': margin_calls,
+        'lots': lots,
+        'holdings': holdings,
+    }
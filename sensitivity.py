@@ -0,0 +1,149 @@
+
+import numpy as np
+
+from simulation import STATE_MACHINE_INPUTS, generate_draws, simulate_net_worth
+
+# Bounds that keep a perturbed input inside its valid range
+_LOWER_BOUNDS = {
+    'initial_portfolio_value': 0.0,
+    'initial_cost_basis': 0.0,
+    'annual_spending': 0.0,
+    'monthly_passive_income': 0.0,
+    'portfolio_annual_std_dev': 0.0,
+    'quarterly_dividend_yield': 0.0,
+    'margin_loan_annual_interest_rate_std_dev': 0.0,
+    'brokerage_margin_limit': 0.0,
+    'federal_tax_free_gain_limit': 0.0,
+    'tax_harvesting_profit_threshold': 0.0,
+}
+_UPPER_BOUNDS = {
+    'brokerage_margin_limit': 0.99,
+}
+
+# Typical magnitude of each input, in its own units, used to size the step when the value is zero
+_ZERO_VALUE_SCALES = {
+    'initial_portfolio_value': 1000000.0,
+    'initial_cost_basis': 1000000.0,
+    'annual_spending': 100000.0,
+    'monthly_passive_income': 1000.0,
+    'portfolio_annual_return': 0.05,
+    'portfolio_annual_std_dev': 0.15,
+    'quarterly_dividend_yield': 0.01,
+    'margin_loan_annual_avg_interest_rate': 0.05,
+    'margin_loan_annual_interest_rate_std_dev': 0.01,
+    'brokerage_margin_limit': 0.5,
+    'federal_tax_free_gain_limit': 100000.0,
+    'tax_harvesting_profit_threshold': 0.3,
+}
+
+
+def _outcome_metrics(net_worth):
+    """
+    Computes the ruin probability and median terminal net worth per parameter set.
+
+    Args:
+        net_worth (np.ndarray): A (k, num_simulations, num_months) array.
+
+    Returns:
+        tuple: Two (k,) arrays holding the ruin probabilities and the median
+        terminal net worth of each parameter set.
+    """
+    ruin_probability = 1 - np.mean(np.all(net_worth > 0, axis=-1), axis=-1)
+    median_terminal_net_worth = np.median(net_worth[..., -1], axis=-1)
+    return ruin_probability, median_terminal_net_worth
+
+
+def run_sensitivity(inputs, parameters=None, relative_step=0.1, draws=None):
+    """
+    Measures how much each input moves the simulation outcomes.
+
+    Every parameter is nudged down and up by ``relative_step`` of its value,
+    or of a typical magnitude for that input when the value is zero. The low
+    and high values are clamped to the input's valid range and never cross
+    the base value, so at a bound the difference becomes one-sided. All perturbed
+    parameter sets plus the base case are stacked and evaluated in a single
+    state machine pass on the same random draws, so the differences reflect
+    the parameter change rather than sampling noise.
+
+    Args:
+        inputs (dict): The simulation parameters.
+        parameters (list, optional): Names of the inputs to perturb. Defaults to
+            every input used by the state machine. Repeated names are evaluated once.
+        relative_step (float): The relative size of each perturbation.
+        draws (dict, optional): Pre-generated random draws from ``generate_draws``.
+
+    Returns:
+        dict: A dictionary containing:
+            - base_ruin_probability (float): Share of scenarios whose net worth
+              drops to zero or below at any point, for the unperturbed inputs.
+            - base_median_terminal_net_worth (float): Median final net worth for
+              the unperturbed inputs.
+            - sensitivities (list): One dict per parameter with the low and high
+              values, the outcomes at each, and the central finite-difference
+              (or one-sided at a bound) derivatives of both outcomes. Sorted by
+              the swing in median terminal net worth, largest first, ready for
+              a tornado chart.
+
+    Raises:
+        ValueError: If ``parameters`` is empty or names an unsupported input.
+    """
+    if parameters is None:
+        parameters = list(STATE_MACHINE_INPUTS)
+    # Repeated names would overwrite each other's rows in the stacked inputs
+    parameters = list(dict.fromkeys(parameters))
+    if not parameters:
+        raise ValueError("At least one sensitivity parameter is required.")
+    unknown = [name for name in parameters if name not in STATE_MACHINE_INPUTS]
+    if unknown:
+        raise ValueError(f"Unsupported sensitivity parameters: {', '.join(unknown)}")
+    if draws is None:
+        draws = generate_draws(inputs)
+
+    # Row 0 is the base case, rows 2i+1 and 2i+2 are the low and high values of parameter i
+    num_sets = 2 * len(parameters) + 1
+    stacked_inputs = dict(inputs)
+    bounds = []
+    for i, name in enumerate(parameters):
+        value = float(inputs[name])
+        stacked_inputs[name] = np.full((num_sets, 1), value)
+        step = relative_step * (abs(value) if value != 0 else _ZERO_VALUE_SCALES[name])
+        low = min(max(value - step, _LOWER_BOUNDS.get(name, -np.inf)), value)
+        high = max(min(value + step, _UPPER_BOUNDS.get(name, np.inf)), value)
+        stacked_inputs[name][2 * i + 1] = low
+        stacked_inputs[name][2 * i + 2] = high
+        bounds.append((low, high))
+
+    ruin_probability, median_terminal_net_worth = _outcome_metrics(
+        simulate_net_worth(stacked_inputs, draws)
+    )
+
+    sensitivities = []
+    for i, name in enumerate(parameters):
+        low, high = bounds[i]
+        lo_row, hi_row = 2 * i + 1, 2 * i + 2
+        sensitivities.append({
+            'parameter': name,
+            'base_value': float(inputs[name]),
+            'low_value': low,
+            'high_value': high,
+            'ruin_probability_low': float(ruin_probability[lo_row]),
+            'ruin_probability_high': float(ruin_probability[hi_row]),
+            'median_terminal_net_worth_low': float(median_terminal_net_worth[lo_row]),
+            'median_terminal_net_worth_high': float(median_terminal_net_worth[hi_row]),
+            'ruin_probability_sensitivity': float(
+                (ruin_probability[hi_row] - ruin_probability[lo_row]) / (high - low)
+            ),
+            'median_terminal_net_worth_sensitivity': float(
+                (median_terminal_net_worth[hi_row] - median_terminal_net_worth[lo_row]) / (high - low)
+            ),
+        })
+    sensitivities.sort(
+        key=lambda s: abs(s['median_terminal_net_worth_high'] - s['median_terminal_net_worth_low']),
+        reverse=True
+    )
+
+    return {
+        'base_ruin_probability': float(ruin_probability[0]),
+        'base_median_terminal_net_worth': float(median_terminal_net_worth[0]),
+        'sensitivities': sensitivities,
+    }
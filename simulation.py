@@ -2,207 +2,410 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
-def run_simulation(inputs):
+NUM_MONTHS = 120
+CA_TAX_RATE = 0.093
+
+# Inputs consumed by the state machine. None of them changes the random draws.
+STATE_MACHINE_INPUTS = (
+    'initial_portfolio_value',
+    'initial_cost_basis',
+    'annual_spending',
+    'monthly_passive_income',
+    'portfolio_annual_return',
+    'portfolio_annual_std_dev',
+    'quarterly_dividend_yield',
+    'margin_loan_annual_avg_interest_rate',
+    'margin_loan_annual_interest_rate_std_dev',
+    'brokerage_margin_limit',
+    'federal_tax_free_gain_limit',
+    'tax_harvesting_profit_threshold',
+)
+
+# Inputs that determine the random draws.
+DRAW_INPUTS = (
+    'num_simulations',
+    'seed',
+    'return_distribution_model',
+    'return_distribution_df',
+    'interest_rate_distribution_model',
+    'interest_rate_distribution_df',
+)
+
+
+def _draw_standardized(model, size, df=None, rng=None):
     """
-    Runs the Monte Carlo retirement simulation.
+    Draws zero-mean, unit-variance shocks from the requested distribution.
+
+    The caller turns a shock ``z`` into a sample with ``loc + scale * z``, which
+    is exactly how the Normal, Student's t and Laplace models are parameterised,
+    so the same shocks can be re-used for any mean and standard deviation.
 
     Args:
-        inputs (dict): A dictionary containing all the user-defined simulation parameters.
+        model (str): 'Normal', "Student's t" or 'Laplace'.
+        size (tuple): The shape of the array to draw.
+        df (float, optional): Degrees of freedom for the Student's t model.
+        rng (np.random.Generator, optional): The random generator to draw from.
 
     Returns:
-        tuple: A tuple containing:
-            - results (dict): A dictionary containing the aggregated simulation results.
-            - all_simulations_net_worth (list): A list of lists, where each inner list
-              contains the net worth for each month of a single simulation.
+        np.ndarray: The standardized shocks.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if model == "Student's t":
+        # The standard_t distribution has a variance of df/(df-2) for df > 2
+        # We need to scale it to have a unit standard deviation
+        if df is None or df <= 2:
+            df = 5 # Fallback to a reasonable default
+        return rng.standard_t(df, size=size) / np.sqrt(df / (df - 2))
+    elif model == 'Laplace':
+        # The Laplace distribution scale parameter 'b' is std/sqrt(2)
+        return rng.laplace(0.0, 1 / np.sqrt(2), size=size)
+    else: # Default to Normal
+        return rng.standard_normal(size=size)
+
+
+def generate_draws(inputs, num_months=NUM_MONTHS, seed=None):
     """
+    Pre-generates every random draw a simulation needs.
 
-    # --- Helper function for random number generation --- 
-    def _get_random_number(model, loc, scale, df=None):
-        if model == "Student's t":
-            # The standard_t distribution has a variance of df/(df-2) for df > 2
-            # We need to scale it to have the desired standard deviation (scale)
-            if df is None or df <= 2:
-                df = 5 # Fallback to a reasonable default
-            scaled_std = scale / np.sqrt(df / (df - 2))
-            return loc + np.random.standard_t(df) * scaled_std
-        elif model == 'Laplace':
-            # The Laplace distribution scale parameter 'b' is std/sqrt(2)
-            return np.random.laplace(loc, scale / np.sqrt(2))
-        else: # Default to Normal
-            return np.random.normal(loc, scale)
+    Only the distribution settings, the number of simulations and the seed
+    affect the draws. All other inputs are applied later by
+    ``simulate_net_worth``, so one set of draws can be re-used across many
+    parameter values (common random numbers).
 
+    Args:
+        inputs (dict): The simulation parameters.
+        num_months (int): The length of the simulated horizon.
+        seed (int, optional): Seed for the random generator. Falls back to
+            ``inputs['seed']`` and then to fresh entropy.
+
+    Returns:
+        dict: A dictionary containing:
+            - return_shocks (np.ndarray): (num_simulations, num_months) standardized
+              monthly return shocks.
+            - rate_shocks (np.ndarray): (num_simulations, num_years) standardized
+              annual margin rate shocks.
+    """
+    if seed is None:
+        seed = inputs.get('seed')
+    rng = np.random.default_rng(seed)
+    num_simulations = int(inputs['num_simulations'])
+    num_years = -(-num_months // 12)
+
+    rate_shocks = _draw_standardized(
+        inputs.get('interest_rate_distribution_model', 'Normal'),
+        (num_simulations, num_years),
+        inputs.get('interest_rate_distribution_df', 5),
+        rng
+    )
+    return_shocks = _draw_standardized(
+        inputs.get('return_distribution_model', 'Normal'),
+        (num_simulations, num_months),
+        inputs.get('return_distribution_df', 5),
+        rng
+    )
+    return {'return_shocks': return_shocks, 'rate_shocks': rate_shocks}
+
+
+def draws_key(inputs):
+    """
+    Returns a hashable key of the inputs that determine the random draws.
+
+    Degrees of freedom are only part of the key when the Student's t model
+    uses them, so moving an unused slider does not invalidate cached draws.
+    """
+    key = {name: inputs.get(name) for name in DRAW_INPUTS}
+    if key['return_distribution_model'] != "Student's t":
+        key['return_distribution_df'] = None
+    if key['interest_rate_distribution_model'] != "Student's t":
+        key['interest_rate_distribution_df'] = None
+    return tuple(key[name] for name in DRAW_INPUTS)
+
+
+def reuse_or_generate_draws(inputs, cached=None):
+    """
+    Returns cached draws when they still match the inputs, or generates new ones.
+
+    Args:
+        inputs (dict): The simulation parameters.
+        cached (dict, optional): A previous return value of this function.
+
+    Returns:
+        dict: A dictionary containing:
+            - key (tuple): The ``draws_key`` of the inputs.
+            - draws (dict): Random draws as returned by ``generate_draws``.
+    """
+    key = draws_key(inputs)
+    if cached is not None and cached.get('key') == key:
+        return cached
+    return {'key': key, 'draws': generate_draws(inputs)}
+
+
+def _safe_ratio(numerator, denominator):
+    """ Returns numerator / denominator, or 0 wherever the denominator is not positive. """
+    numerator, denominator = np.broadcast_arrays(numerator, denominator)
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=denominator > 0)
+
+
+def simulate_paths(inputs, draws):
+    """
+    Runs the monthly state machine for every scenario at once.
+
+    Each numeric input may be a scalar or an array that broadcasts against the
+    scenario axis. A (num_simulations,) array gives every scenario its own
+    value, while a (k, 1) array evaluates k parameter sets on the same draws
+    and adds a leading axis to the result.
+
+    Args:
+        inputs (dict): The simulation parameters.
+        draws (dict): Random draws as returned by ``generate_draws``.
+
+    Returns:
+        dict: A dictionary containing:
+            - net_worth (np.ndarray): A (..., num_simulations, num_months) array of
+              monthly net worth.
+            - margin_calls (np.ndarray): A boolean array of the same shape, True in
+              the months where a forced sale took place.
+    """
+    return_shocks = draws['return_shocks']
+    rate_shocks = draws['rate_shocks']
+    num_simulations, num_months = return_shocks.shape
 
     # Extract inputs from the dictionary
-    initial_portfolio_value = inputs['initial_portfolio_value']
-    initial_cost_basis = inputs['initial_cost_basis']
-    annual_spending = inputs['annual_spending']
-    monthly_passive_income = inputs['monthly_passive_income']
-    portfolio_annual_return = inputs['portfolio_annual_return']
-    portfolio_annual_std_dev = inputs['portfolio_annual_std_dev']
-    quarterly_dividend_yield = inputs['quarterly_dividend_yield']
-    margin_loan_annual_avg_interest_rate = inputs['margin_loan_annual_avg_interest_rate']
-    margin_loan_annual_interest_rate_std_dev = inputs['margin_loan_annual_interest_rate_std_dev']
-    brokerage_margin_limit = inputs['brokerage_margin_limit']
-    federal_tax_free_gain_limit = inputs['federal_tax_free_gain_limit']
-    tax_harvesting_profit_threshold = inputs['tax_harvesting_profit_threshold']
-    num_simulations = inputs['num_simulations']
-    # New distribution inputs
-    return_distribution_model = inputs.get('return_distribution_model', 'Normal')
-    return_distribution_df = inputs.get('return_distribution_df', 5)
-    interest_rate_distribution_model = inputs.get('interest_rate_distribution_model', 'Normal')
-    interest_rate_distribution_df = inputs.get('interest_rate_distribution_df', 5)
+    initial_portfolio_value = np.asarray(inputs['initial_portfolio_value'], dtype=float)
+    initial_cost_basis = np.asarray(inputs['initial_cost_basis'], dtype=float)
+    annual_spending = np.asarray(inputs['annual_spending'], dtype=float)
+    monthly_passive_income = np.asarray(inputs['monthly_passive_income'], dtype=float)
+    portfolio_annual_return = np.asarray(inputs['portfolio_annual_return'], dtype=float)
+    portfolio_annual_std_dev = np.asarray(inputs['portfolio_annual_std_dev'], dtype=float)
+    quarterly_dividend_yield = np.asarray(inputs['quarterly_dividend_yield'], dtype=float)
+    margin_loan_annual_avg_interest_rate = np.asarray(inputs['margin_loan_annual_avg_interest_rate'], dtype=float)
+    margin_loan_annual_interest_rate_std_dev = np.asarray(inputs['margin_loan_annual_interest_rate_std_dev'], dtype=float)
+    brokerage_margin_limit = np.asarray(inputs['brokerage_margin_limit'], dtype=float)
+    federal_tax_free_gain_limit = np.asarray(inputs['federal_tax_free_gain_limit'], dtype=float)
+    tax_harvesting_profit_threshold = np.asarray(inputs['tax_harvesting_profit_threshold'], dtype=float)
 
     # --- Simulation setup ---
-    num_months = 120
     monthly_spending = annual_spending / 12
     monthly_return = (1 + portfolio_annual_return)**(1/12) - 1
     monthly_std_dev = portfolio_annual_std_dev / np.sqrt(12)
-
-    all_simulations_net_worth = []
-
-    for _ in range(num_simulations):
-        # --- Initialize scenario variables ---
-        long_term_value = initial_portfolio_value
-        long_term_basis = initial_cost_basis
-        short_term_value = 0
-        short_term_basis = 0
-        margin_loan = 0
-
-        total_margin_interest_paid_this_year = 0
-        gains_realized_this_year = 0
-        total_dividend_income_this_year = 0
-
-        current_annual_margin_rate = _get_random_number(
-            interest_rate_distribution_model,
-            margin_loan_annual_avg_interest_rate,
-            margin_loan_annual_interest_rate_std_dev,
-            interest_rate_distribution_df
+    cash_shortfall = monthly_spending - monthly_passive_income
+
+    # --- Initialize scenario variables ---
+    state_shape = np.broadcast_shapes(
+        *(np.shape(inputs[name]) for name in STATE_MACHINE_INPUTS), (num_simulations,)
+    )
+    zeros = np.zeros(state_shape)
+    long_term_value = zeros + initial_portfolio_value
+    long_term_basis = zeros + initial_cost_basis
+    short_term_value = zeros.copy()
+    short_term_basis = zeros.copy()
+    margin_loan = zeros.copy()
+
+    total_margin_interest_paid_this_year = zeros.copy()
+    gains_realized_this_year = zeros.copy()
+    total_dividend_income_this_year = zeros.copy()
+
+    current_annual_margin_rate = (
+        margin_loan_annual_avg_interest_rate
+        + margin_loan_annual_interest_rate_std_dev * rate_shocks[:, 0]
+    )
+
+    net_worth = np.empty(state_shape + (num_months,))
+    margin_calls = np.zeros(state_shape + (num_months,), dtype=bool)
+
+    for month in range(1, num_months + 1):
+        # --- Monthly simulation loop ---
+
+        # Step 1: Asset Aging
+        aging_value = short_term_value / 12
+        aging_basis = short_term_basis / 12
+        short_term_value = short_term_value - aging_value
+        short_term_basis = short_term_basis - aging_basis
+        long_term_value = long_term_value + aging_value
+        long_term_basis = long_term_basis + aging_basis
+
+        # Step 2: Calculate Market Returns & Update Portfolio
+        random_monthly_return = monthly_return + monthly_std_dev * return_shocks[:, month - 1]
+        long_term_value = long_term_value * (1 + random_monthly_return)
+        short_term_value = short_term_value * (1 + random_monthly_return)
+
+        # Step 3: Handle Quarterly Dividends
+        if month % 3 == 0:
+            dividend_payment = (long_term_value + short_term_value) * quarterly_dividend_yield
+            margin_loan = margin_loan - dividend_payment
+            total_dividend_income_this_year = total_dividend_income_this_year + dividend_payment
+
+        # Step 4: Cover Expenses & Update Margin Loan
+        margin_loan = margin_loan + cash_shortfall
+        monthly_margin_interest = margin_loan * (current_annual_margin_rate / 12)
+        margin_loan = margin_loan + monthly_margin_interest
+        total_margin_interest_paid_this_year = total_margin_interest_paid_this_year + monthly_margin_interest
+
+        # Step 5: Check for Forced Selling (Deleveraging)
+        total_portfolio_value = long_term_value + short_term_value
+        margin_limit = total_portfolio_value * brokerage_margin_limit
+        margin_call = margin_loan > margin_limit
+        margin_calls[..., month - 1] = margin_call
+        amount_to_sell = np.where(
+            margin_call,
+            (margin_loan - margin_limit) / (1 - brokerage_margin_limit),
+            0.0
         )
-
-        monthly_net_worth = []
-
-        for month in range(1, num_months + 1):
-            # --- Monthly simulation loop ---
-
-            # Step 1: Asset Aging
-            aging_value = short_term_value / 12
-            aging_basis = short_term_basis / 12
-            short_term_value -= aging_value
-            short_term_basis -= aging_basis
-            long_term_value += aging_value
-            long_term_basis += aging_basis
-
-            # Step 2: Calculate Market Returns & Update Portfolio
-            random_monthly_return = _get_random_number(
-                return_distribution_model,
-                monthly_return,
-                monthly_std_dev,
-                return_distribution_df
+        sell_from_long_term = np.where(long_term_value > 0, np.minimum(amount_to_sell, long_term_value), 0.0)
+        sold_fraction = _safe_ratio(sell_from_long_term, long_term_value)
+        gains_realized_this_year = gains_realized_this_year + sold_fraction * (long_term_value - long_term_basis)
+        long_term_basis = long_term_basis - sold_fraction * long_term_basis
+        long_term_value = long_term_value - sell_from_long_term
+        margin_loan = margin_loan - sell_from_long_term
+
+        remaining_to_sell = amount_to_sell - sell_from_long_term
+        sell_from_short_term = np.where(
+            (remaining_to_sell > 0) & (short_term_value > 0),
+            np.minimum(remaining_to_sell, short_term_value),
+            0.0
+        )
+        sold_fraction = _safe_ratio(sell_from_short_term, short_term_value)
+        gains_realized_this_year = gains_realized_this_year + sold_fraction * (short_term_value - short_term_basis)
+        short_term_basis = short_term_basis - sold_fraction * short_term_basis
+        short_term_value = short_term_value - sell_from_short_term
+        margin_loan = margin_loan - sell_from_short_term
+
+        # Step 6: Execute End-of-Year Tax Strategy
+        if month % 12 == 0:
+            unrealized_long_term_gain = long_term_value - long_term_basis
+            unrealized_long_term_gain_percentage = _safe_ratio(unrealized_long_term_gain, long_term_value)
+
+            total_investment_income_so_far = gains_realized_this_year + total_dividend_income_this_year
+            gains_to_harvest = federal_tax_free_gain_limit - total_investment_income_so_far
+            harvest = (
+                (unrealized_long_term_gain_percentage > tax_harvesting_profit_threshold)
+                & (gains_to_harvest > 0)
+                & (unrealized_long_term_gain > 0)
+            )
+            value_to_harvest = np.where(
+                harvest,
+                np.minimum(_safe_ratio(gains_to_harvest, unrealized_long_term_gain_percentage), long_term_value),
+                0.0
             )
-            long_term_value *= (1 + random_monthly_return)
-            short_term_value *= (1 + random_monthly_return)
-
-            # Step 3: Handle Quarterly Dividends
-            total_portfolio_value = long_term_value + short_term_value
-            if month % 3 == 0:
-                dividend_payment = total_portfolio_value * quarterly_dividend_yield
-                margin_loan -= dividend_payment
-                total_dividend_income_this_year += dividend_payment
-
-            # Step 4: Cover Expenses & Update Margin Loan
-            cash_shortfall = monthly_spending - monthly_passive_income
-            margin_loan += cash_shortfall
-            monthly_margin_interest = margin_loan * (current_annual_margin_rate / 12)
-            margin_loan += monthly_margin_interest
-            total_margin_interest_paid_this_year += monthly_margin_interest
-
-            # Step 5: Check for Forced Selling (Deleveraging)
-            total_portfolio_value = long_term_value + short_term_value
-            margin_limit = total_portfolio_value * brokerage_margin_limit
-            if margin_loan > margin_limit:
-                amount_to_sell = (margin_loan - margin_limit) / (1 - brokerage_margin_limit)
-                if long_term_value > 0:
-                    sell_from_long_term = min(amount_to_sell, long_term_value)
-                    gain_from_lt_sale = (sell_from_long_term / long_term_value) * (long_term_value - long_term_basis)
-                    long_term_basis -= (sell_from_long_term / long_term_value) * long_term_basis
-                    long_term_value -= sell_from_long_term
-                    gains_realized_this_year += gain_from_lt_sale
-                    margin_loan -= sell_from_long_term
-
-                if amount_to_sell > sell_from_long_term and short_term_value > 0:
-                    sell_from_short_term = min(amount_to_sell - sell_from_long_term, short_term_value)
-                    gain_from_st_sale = (sell_from_short_term / short_term_value) * (short_term_value - short_term_basis)
-                    short_term_basis -= (sell_from_short_term / short_term_value) * short_term_basis
-                    short_term_value -= sell_from_short_term
-                    gains_realized_this_year += gain_from_st_sale
-                    margin_loan -= sell_from_short_term
-
-
-            # Step 6: Execute End-of-Year Tax Strategy
-            if month % 12 == 0:
-                unrealized_long_term_gain = long_term_value - long_term_basis
-                if long_term_value > 0:
-                    unrealized_long_term_gain_percentage = unrealized_long_term_gain / long_term_value
-                else:
-                    unrealized_long_term_gain_percentage = 0
-
-
-                if unrealized_long_term_gain_percentage > tax_harvesting_profit_threshold:
-                    total_investment_income_so_far = gains_realized_this_year + total_dividend_income_this_year
-                    gains_to_harvest = federal_tax_free_gain_limit - total_investment_income_so_far
-
-                    if gains_to_harvest > 0 and unrealized_long_term_gain > 0:
-                        value_to_harvest = gains_to_harvest / unrealized_long_term_gain_percentage
-                        if value_to_harvest > long_term_value:
-                            value_to_harvest = long_term_value
-
-                        harvested_basis = (value_to_harvest / long_term_value) * long_term_basis
-                        long_term_value -= value_to_harvest
-                        long_term_basis -= harvested_basis
-                        short_term_value += value_to_harvest
-                        short_term_basis += value_to_harvest
-                        gains_realized_this_year += gains_to_harvest
-
-                # Calculate and "Pay" California Tax
-                total_investment_income = gains_realized_this_year + total_dividend_income_this_year
-                net_investment_income = total_investment_income - total_margin_interest_paid_this_year
-                # Simplified CA tax calculation
-                ca_tax_due = net_investment_income * 0.093
-                margin_loan += ca_tax_due
-
-                # Reset annual counters and set new margin rate
-                total_margin_interest_paid_this_year = 0
-                gains_realized_this_year = 0
-                total_dividend_income_this_year = 0
-                current_annual_margin_rate = _get_random_number(
-                    interest_rate_distribution_model,
-                    margin_loan_annual_avg_interest_rate,
-                    margin_loan_annual_interest_rate_std_dev,
-                    interest_rate_distribution_df
+            harvested_basis = _safe_ratio(value_to_harvest, long_term_value) * long_term_basis
+            long_term_value = long_term_value - value_to_harvest
+            long_term_basis = long_term_basis - harvested_basis
+            short_term_value = short_term_value + value_to_harvest
+            short_term_basis = short_term_basis + value_to_harvest
+            gains_realized_this_year = gains_realized_this_year + np.where(harvest, gains_to_harvest, 0.0)
+
+            # Calculate and "Pay" California Tax
+            total_investment_income = gains_realized_this_year + total_dividend_income_this_year
+            net_investment_income = total_investment_income - total_margin_interest_paid_this_year
+            # Simplified CA tax calculation
+            ca_tax_due = net_investment_income * CA_TAX_RATE
+            margin_loan = margin_loan + ca_tax_due
+
+            # Reset annual counters and set new margin rate
+            total_margin_interest_paid_this_year = zeros.copy()
+            gains_realized_this_year = zeros.copy()
+            total_dividend_income_this_year = zeros.copy()
+            if month // 12 < rate_shocks.shape[1]:
+                current_annual_margin_rate = (
+                    margin_loan_annual_avg_interest_rate
+                    + margin_loan_annual_interest_rate_std_dev * rate_shocks[:, month // 12]
                 )
 
-            # Step 7: Record Net Worth
-            net_worth = (long_term_value + short_term_value) - margin_loan
-            monthly_net_worth.append(net_worth)
+        # Step 7: Record Net Worth
+        net_worth[..., month - 1] = (long_term_value + short_term_value) - margin_loan
 
-            # Stop simulation if average net worth is below zero
-            if all_simulations_net_worth and np.mean([sim[-1] for sim in all_simulations_net_worth if sim]) < 0:
-                break
+    return {'net_worth': net_worth, 'margin_calls': margin_calls}
 
-        all_simulations_net_worth.append(monthly_net_worth)
 
-    # --- Final Aggregation ---
-    max_len = max(len(sim) for sim in all_simulations_net_worth if sim)
-    padded_simulations = [sim + [sim[-1]] * (max_len - len(sim)) if sim else [0] * max_len for sim in all_simulations_net_worth]
+def simulate_net_worth(inputs, draws):
+    """
+    Runs the monthly state machine and returns only the net worth paths.
+
+    See ``simulate_paths`` for how inputs broadcast against the scenario axis.
+
+    Returns:
+        np.ndarray: A (..., num_simulations, num_months) array of monthly net worth.
+    """
+    return simulate_paths(inputs, draws)['net_worth']
+
+
+def _apply_early_stop(net_worth):
+    """
+    Applies the original stopping rule to a matrix of full-length paths.
+
+    Scenarios run in order, and once the average final net worth of the
+    scenarios already completed drops below zero, each following scenario
+    stops after its first month.
+
+    Args:
+        net_worth (np.ndarray): (num_simulations, num_months) net worth paths.
+
+    Returns:
+        np.ndarray: The length, in months, of each recorded scenario.
+    """
+    num_simulations, num_months = net_worth.shape
+    lengths = np.full(num_simulations, num_months)
+    final_sum = 0.0
+    for i in range(num_simulations):
+        if i > 0 and final_sum / i < 0:
+            lengths[i] = 1
+        final_sum += net_worth[i, lengths[i] - 1]
+    return lengths
+
+
+def aggregate_net_worth(net_worth):
+    """
+    Aggregates net worth paths into the monthly max, average and min.
+
+    Args:
+        net_worth (np.ndarray): (num_simulations, num_months) net worth paths.
+
+    Returns:
+        tuple: A tuple containing:
+            - results (dict): A dictionary containing the aggregated simulation results.
+            - all_simulations_net_worth (list): A list of lists, where each inner list
+              contains the net worth for each month of a single simulation.
+    """
+    lengths = _apply_early_stop(net_worth)
+    max_len = int(lengths.max())
+    padded_simulations = net_worth[:, :max_len].copy()
+    stopped = lengths < max_len
+    padded_simulations[stopped, 1:] = padded_simulations[stopped, :1]
 
     results = {
         'max_net_worth': np.max(padded_simulations, axis=0),
         'avg_net_worth': np.mean(padded_simulations, axis=0),
         'min_net_worth': np.min(padded_simulations, axis=0)
     }
-
+    all_simulations_net_worth = [net_worth[i, :lengths[i]].tolist() for i in range(len(lengths))]
     return results, all_simulations_net_worth
 
+
+def survival_probability(net_worth):
+    """ Returns the fraction of scenarios whose net worth stays positive in every month. """
+    return float(np.mean(np.all(net_worth > 0, axis=1)))
+
+
+def run_simulation(inputs, draws=None):
+    """
+    Runs the Monte Carlo retirement simulation.
+
+    Args:
+        inputs (dict): A dictionary containing all the user-defined simulation parameters.
+        draws (dict, optional): Pre-generated random draws from ``generate_draws``.
+            New draws are generated when omitted.
+
+    Returns:
+        tuple: A tuple containing:
+            - results (dict): A dictionary containing the aggregated simulation results.
+            - all_simulations_net_worth (list): A list of lists, where each inner list
+              contains the net worth for each month of a single simulation.
+    """
+    if draws is None:
+        draws = generate_draws(inputs)
+    net_worth = simulate_net_worth(inputs, draws)
+    return aggregate_net_worth(net_worth)
+
 def plot_results(results):
     """
     Plots the simulation results.
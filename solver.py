@@ -0,0 +1,111 @@
+
+import numpy as np
+
+from simulation import generate_draws, simulate_net_worth, survival_probability
+
+
+def _evaluate_spending(inputs, draws, annual_spending, terminal_wealth_percentile):
+    """
+    Runs the state machine for one spending level on a fixed set of draws.
+
+    Returns:
+        tuple: The survival probability and the requested terminal net worth
+        percentile (or None when no percentile was requested).
+    """
+    net_worth = simulate_net_worth({**inputs, 'annual_spending': annual_spending}, draws)
+    terminal_value = None
+    if terminal_wealth_percentile is not None:
+        terminal_value = float(np.percentile(net_worth[:, -1], terminal_wealth_percentile))
+    return survival_probability(net_worth), terminal_value
+
+
+def solve_spending(
+    inputs,
+    target_survival_probability=0.9,
+    terminal_wealth_percentile=None,
+    target_terminal_wealth=0.0,
+    tolerance=100.0,
+    max_iterations=60,
+    draws=None
+):
+    """
+    Finds the maximum annual spending that still meets a survival target.
+
+    The random draws are generated once and shared by every candidate spending
+    level, so each bisection step only re-runs the deterministic state machine
+    and the outcome is a monotone, noise-free function of spending.
+
+    By default a plan meets the target when the share of scenarios whose net
+    worth stays positive throughout is at least ``target_survival_probability``.
+    When ``terminal_wealth_percentile`` is given, the plan must instead keep
+    that percentile of final net worth at or above ``target_terminal_wealth``.
+
+    Args:
+        inputs (dict): The simulation parameters. ``annual_spending`` is ignored.
+        target_survival_probability (float): Required survival probability (0-1).
+        terminal_wealth_percentile (float, optional): Percentile (0-100) of final
+            net worth to constrain instead of the survival probability.
+        target_terminal_wealth (float): Minimum value for that percentile.
+        tolerance (float): Width, in dollars, of the final search bracket.
+        max_iterations (int): Upper bound on the number of state machine passes.
+        draws (dict, optional): Pre-generated random draws from ``generate_draws``.
+
+    Returns:
+        dict: A dictionary containing:
+            - annual_spending (float): The highest spending found to meet the target.
+            - survival_probability (float): Survival probability at that spending.
+            - terminal_wealth (float or None): The constrained percentile of final
+              net worth at that spending, when a percentile target was used.
+            - iterations (int): The number of state machine passes performed.
+            - feasible (bool): False if even zero spending misses the target.
+    """
+    if draws is None:
+        draws = generate_draws(inputs)
+
+    def meets_target(annual_spending):
+        survival, terminal_value = _evaluate_spending(
+            inputs, draws, annual_spending, terminal_wealth_percentile
+        )
+        if terminal_wealth_percentile is not None:
+            return terminal_value >= target_terminal_wealth, survival, terminal_value
+        return survival >= target_survival_probability, survival, terminal_value
+
+    iterations = 1
+    ok, survival, terminal_value = meets_target(0.0)
+    if not ok:
+        return {
+            'annual_spending': 0.0,
+            'survival_probability': survival,
+            'terminal_wealth': terminal_value,
+            'iterations': iterations,
+            'feasible': False,
+        }
+    low, best = 0.0, (survival, terminal_value)
+
+    # Grow the upper bound until it fails the target
+    high = max(float(inputs['annual_spending']), float(inputs['initial_portfolio_value']) / 10)
+    while iterations < max_iterations:
+        iterations += 1
+        ok, survival, terminal_value = meets_target(high)
+        if not ok:
+            break
+        low, best = high, (survival, terminal_value)
+        high *= 2
+
+    # Bisect between the last passing and the first failing spending level
+    while high - low > tolerance and iterations < max_iterations:
+        iterations += 1
+        mid = (low + high) / 2
+        ok, survival, terminal_value = meets_target(mid)
+        if ok:
+            low, best = mid, (survival, terminal_value)
+        else:
+            high = mid
+
+    return {
+        'annual_spending': low,
+        'survival_probability': best[0],
+        'terminal_wealth': best[1],
+        'iterations': iterations,
+        'feasible': True,
+    }
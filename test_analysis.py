@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from analysis import format_summary, request_analysis, summarize_paths
+from simulation import generate_draws, simulate_paths
+from test_simulation import BASE_INPUTS
+
+class StubClient:
+    """ Offline stand-in for the Gemini client that records the prompt it receives. """
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        return "stub analysis"
+
+def test_summarize_paths_statistics():
+    """ Tests the ruin probability, margin-call frequency and yearly checkpoints on hand-made paths. """
+    net_worth = np.array([
+        np.linspace(100, 200, 24),
+        np.linspace(100, -50, 24),
+    ])
+    margin_calls = np.zeros_like(net_worth, dtype=bool)
+    margin_calls[1, [5, 6, 7]] = True
+    summary = summarize_paths(net_worth, margin_calls)
+    assert summary['ruin_probability'] == 0.5
+    assert summary['margin_call_scenario_share'] == 0.5
+    assert summary['margin_calls_per_scenario_year'] == 0.75
+    assert [c['month'] for c in summary['yearly_checkpoints']] == [12, 24]
+    assert summary['yearly_checkpoints'][-1]['p50'] == 75
+
+def test_summary_prompt_is_compact():
+    """ Tests that the formatted summary is far smaller than the monthly table it replaces. """
+    paths = simulate_paths(BASE_INPUTS, generate_draws(BASE_INPUTS))
+    text = format_summary(summarize_paths(paths['net_worth'], paths['margin_calls']))
+    assert text.count("\n") < 20
+    assert "Probability of ruin" in text
+
+def test_request_analysis_records_prompt_size_and_latency():
+    """ Tests the LLM call path against a local stub client. """
+    client = StubClient()
+    result = request_analysis(client, "hello")
+    assert result['text'] == "stub analysis"
+    assert result['prompt_chars'] == 5
+    assert result['latency_seconds'] >= 0
+    assert client.prompts == ["hello"]
+
+def test_get_gemini_analysis_sends_summary_statistics():
+    """ Tests the app's analysis prompt offline: checkpoints and ruin probability, not the monthly table. """
+    pytest.importorskip('gradio')
+    from app import get_gemini_analysis
+
+    prompts = []
+    for num_months in (120, 240):
+        paths = simulate_paths(BASE_INPUTS, generate_draws(BASE_INPUTS, num_months=num_months))
+        stats = summarize_paths(paths['net_worth'], paths['margin_calls'])
+        client = StubClient()
+        text = get_gemini_analysis(
+            "unused-key", "Strategy survived.", stats,
+            1000000, 700000, 120000, 10, 19, 6, 1.5, 50, 300, 30,
+            "Normal", 5, "Normal", 5,
+            client=client,
+        )
+        assert text == "stub analysis"
+        prompt = client.prompts[0]
+        assert f"Probability of ruin (net worth <= $0 at any point): {stats['ruin_probability']:.1%}" in prompt
+        for checkpoint in stats['yearly_checkpoints']:
+            assert f"\n{checkpoint['month']} | " in prompt
+        prompts.append(prompt)
+
+    # Doubling the horizon adds ten year-end rows, not 120 monthly rows
+    assert len(prompts[1].splitlines()) - len(prompts[0].splitlines()) == 10
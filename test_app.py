@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+gr = pytest.importorskip('gradio')
+
+from app import (PLOT_SERIES, build_plot_data, downsample_indices, rerun_with_cached_draws,
+                 run_and_display_simulation)
+
+def test_downsample_indices_keeps_endpoints_and_limit():
+    """ Tests that downsampling keeps the first and last points and never exceeds max_points. """
+    np.testing.assert_array_equal(downsample_indices(50, max_points=240), np.arange(50))
+    for length in (241, 1000, 12345):
+        idx = downsample_indices(length, max_points=240)
+        assert idx[0] == 0 and idx[-1] == length - 1
+        assert len(idx) <= 240
+        assert np.all(np.diff(idx) > 0)
+
+def test_build_plot_data_long_format():
+    """ Tests that the plot table holds three downsampled series in long format. """
+    months = np.arange(1, 601)
+    results = {key: months * (i + 1.0) for i, key in enumerate(PLOT_SERIES.values())}
+    plot_df = build_plot_data(months, results, max_points=100)
+    assert list(plot_df.columns) == ['Month', 'Net Worth', 'Series']
+    assert set(plot_df['Series']) == set(PLOT_SERIES)
+    for label, series in plot_df.groupby('Series'):
+        assert len(series) <= 100
+        assert series['Month'].iloc[0] == 1 and series['Month'].iloc[-1] == 600
+        key = PLOT_SERIES[label]
+        np.testing.assert_array_equal(series['Net Worth'], results[key][series['Month'] - 1])
+
+APP_ARGS = (1000000, 700000, 120000, 10, 19, 6, 1.5, 50, 200, 30, "Normal", 5, "Normal", 5)
+
+def test_run_and_display_simulation_table_stays_numeric():
+    """ Tests that the table sent to gr.Dataframe keeps float columns and only formats for display. """
+    outputs = run_and_display_simulation(*APP_ARGS)
+    plot_df, styled_df = outputs[3], outputs[4]
+    assert len(plot_df) == 3 * 120
+    for column in ('Min Net Worth', 'Avg Net Worth', 'Max Net Worth'):
+        assert styled_df.data[column].dtype == np.float64
+
+def test_strategy_edit_reuses_cached_draws():
+    """ Tests that strategy edits are skipped until a first run, then re-use that run's draws. """
+    assert rerun_with_cached_draws(*APP_ARGS, None) == (gr.skip(),) * 9
+    first = run_and_display_simulation(*APP_ARGS)
+    edited = list(APP_ARGS)
+    edited[2] = 150000
+    outputs = rerun_with_cached_draws(*edited, first[7])
+    assert outputs[7]['draws'] is first[7]['draws']
+    assert outputs[8]['ruin_probability'] >= first[8]['ruin_probability']
+    assert outputs[8]['yearly_checkpoints'] != first[8]['yearly_checkpoints']
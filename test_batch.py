@@ -0,0 +1,54 @@
+import io
+import json
+
+import numpy as np
+
+from batch import read_plans, run_batch
+from simulation import generate_draws, simulate_paths
+
+def _write_plans(path, num_plans):
+    with open(path, 'w') as f:
+        for i in range(num_plans):
+            plan = {'plan_id': f'client-{i}', 'annual_spending': 80000 + 2000 * i,
+                    'num_simulations': 200, 'seed': 11}
+            if i % 2:
+                plan['return_distribution_model'] = 'Laplace'
+            f.write(json.dumps(plan) + "\n")
+
+def test_run_batch_matches_individual_runs(tmp_path):
+    """ Tests that stacked, chunked evaluation matches running each plan on its own. """
+    plans_path = tmp_path / 'plans.jsonl'
+    _write_plans(plans_path, 7)
+    plans, invalid_plans = read_plans(plans_path)
+    assert invalid_plans == []
+    output = io.StringIO()
+    report = run_batch(plans, output, max_batch_elements=3 * 200 * 120)
+
+    assert report['num_plans'] == 7
+    assert report['plan_scenarios'] == 7 * 200
+    results = {r['plan_id']: r for r in map(json.loads, output.getvalue().splitlines())}
+    assert len(results) == 7
+
+    plan_id, inputs = plans[3]
+    paths = simulate_paths(inputs, generate_draws(inputs))
+    expected_ruin = 1 - np.mean(np.all(paths['net_worth'] > 0, axis=1))
+    assert np.isclose(results[plan_id]['ruin_probability'], expected_ruin)
+    assert np.isclose(results[plan_id]['terminal_net_worth_p50'], np.median(paths['net_worth'][:, -1]))
+
+def test_read_plans_keeps_list_fields(tmp_path):
+    """ Tests that list-valued extra fields do not break NaN filtering. """
+    plans_path = tmp_path / 'plans.jsonl'
+    plans_path.write_text(json.dumps({'plan_id': 'a', 'annual_spending': 90000, 'tags': ['x', 'y']}) + "\n")
+    plans, _ = read_plans(plans_path)
+    assert plans[0][0] == 'a'
+    assert plans[0][1]['annual_spending'] == 90000
+
+def test_read_plans_skips_and_reports_invalid_plans(tmp_path):
+    """ Tests that an invalid plan is reported with its id and record number and the rest still load. """
+    plans_path = tmp_path / 'plans.jsonl'
+    records = [{'plan_id': 'ok-1'}, {'plan_id': 'bad', 'annual_spending': -5}, {'annual_spending': 0}, {'plan_id': 'ok-2'}]
+    plans_path.write_text("".join(json.dumps(r) + "\n" for r in records))
+    plans, invalid_plans = read_plans(plans_path)
+    assert [plan_id for plan_id, _ in plans] == ['ok-1', 'ok-2']
+    assert [(p['plan_id'], p['record']) for p in invalid_plans] == [('bad', 2), (2, 3)]
+    assert 'annual_spending' in invalid_plans[0]['error']
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from distributed import LocalCluster, QuantileSketch, run_distributed
+from test_simulation import BASE_INPUTS
+
+INPUTS = {**BASE_INPUTS, 'num_simulations': 1000, 'seed': 21}
+
+def test_quantile_sketch_merge_is_order_independent():
+    """ Tests that merged sketches match a single sketch and stay within the relative accuracy. """
+    values = np.random.default_rng(0).normal(100000, 300000, size=5000)
+    whole = QuantileSketch()
+    whole.add(values)
+    parts = [QuantileSketch() for _ in range(4)]
+    for part, chunk in zip(parts, np.array_split(values, 4)):
+        part.add(chunk)
+    merged = QuantileSketch()
+    for part in reversed(parts):
+        merged.merge(QuantileSketch.from_dict(part.to_dict()))
+    for q in (0.05, 0.5, 0.95):
+        assert merged.quantile(q) == whole.quantile(q)
+        true_value = np.sort(values)[int(q * (len(values) - 1))]
+        assert abs(merged.quantile(q) - true_value) <= 0.011 * abs(true_value)
+
+def test_run_distributed_is_identical_on_one_or_many_workers():
+    """ Tests that local worker processes produce bit-identical results to an in-process run. """
+    single = run_distributed(INPUTS, chunk_size=150)
+    with LocalCluster(3) as cluster:
+        sharded = run_distributed(INPUTS, workers=cluster.addresses, chunk_size=150, authkey=cluster.authkey)
+    assert sharded['num_simulations'] == single['num_simulations'] == 1000
+    for key in ('max_net_worth', 'avg_net_worth', 'min_net_worth'):
+        np.testing.assert_array_equal(sharded[key], single[key])
+    assert sharded['ruin_probability'] == single['ruin_probability']
+    assert sharded['terminal_net_worth_percentiles'] == single['terminal_net_worth_percentiles']
+
+def test_run_distributed_requires_authkey_for_workers(monkeypatch):
+    """ Tests that workers are never contacted with a missing shared secret. """
+    monkeypatch.delenv('SIM_WORKER_AUTHKEY', raising=False)
+    with pytest.raises(RuntimeError):
+        run_distributed(INPUTS, workers=[('127.0.0.1', 1)])
+
+def test_task_error_is_reported_and_workers_survive():
+    """ Tests that a failing task raises its own error and leaves the workers running. """
+    bad_inputs = {key: value for key, value in INPUTS.items() if key != 'annual_spending'}
+    with LocalCluster(2) as cluster:
+        with pytest.raises(RuntimeError, match="KeyError: 'annual_spending'"):
+            run_distributed(bad_inputs, workers=cluster.addresses, chunk_size=150, authkey=cluster.authkey)
+        sharded = run_distributed(INPUTS, workers=cluster.addresses, chunk_size=150, authkey=cluster.authkey)
+
+    assert sharded['num_simulations'] == INPUTS['num_simulations']
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from portfolio import LOT_DTYPE, generate_portfolio_draws, simulate_portfolio
+from simulation import simulate_net_worth
+from test_simulation import BASE_INPUTS
+
+ETF_INPUTS = {
+    **BASE_INPUTS,
+    'assets': [
+        {'name': 'VTI', 'initial_value': 500000, 'initial_cost_basis': 350000,
+         'annual_return': 0.10, 'annual_std_dev': 0.18, 'quarterly_dividend_yield': 0.004},
+        {'name': 'VXUS', 'initial_value': 300000, 'initial_cost_basis': 240000,
+         'annual_return': 0.08, 'annual_std_dev': 0.20, 'quarterly_dividend_yield': 0.007},
+        {'name': 'BND', 'initial_value': 200000, 'initial_cost_basis': 210000,
+         'annual_return': 0.04, 'annual_std_dev': 0.06, 'quarterly_dividend_yield': 0.009},
+    ],
+    'asset_correlation': [
+        [1.0, 0.8, 0.2],
+        [0.8, 1.0, 0.1],
+        [0.2, 0.1, 1.0],
+    ],
+}
+
+def test_portfolio_draws_follow_correlation():
+    """ Tests that the Cholesky-mixed shocks have unit variance and the requested correlation. """
+    draws = generate_portfolio_draws({**ETF_INPUTS, 'num_simulations': 2000}, 3)
+    shocks = draws['return_shocks'].reshape(-1, 3)
+    np.testing.assert_allclose(shocks.std(axis=0), 1, atol=0.02)
+    np.testing.assert_allclose(np.corrcoef(shocks.T), ETF_INPUTS['asset_correlation'], atol=0.02)
+
+def test_single_asset_portfolio_matches_classic_engine_without_harvesting():
+    """ Tests that one lot of one asset reproduces the single-asset state machine when no lots are created. """
+    inputs = {**BASE_INPUTS, 'tax_harvesting_profit_threshold': 10.0}
+    portfolio_draws = generate_portfolio_draws(inputs, 1)
+    classic_draws = {
+        'return_shocks': portfolio_draws['return_shocks'][..., 0],
+        'rate_shocks': portfolio_draws['rate_shocks'],
+    }
+    paths = simulate_portfolio(inputs, portfolio_draws)
+    np.testing.assert_allclose(paths['net_worth'], simulate_net_worth(inputs, classic_draws))
+
+def test_simulate_portfolio_tracks_lots():
+    """ Tests the lot table layout and that harvesting creates stepped-up lots. """
+    paths = simulate_portfolio(ETF_INPUTS)
+    lots, holdings = paths['lots'], paths['holdings']
+    assert lots.dtype == LOT_DTYPE
+    assert len(lots) == 3 * 11
+    assert paths['net_worth'].shape == (BASE_INPUTS['num_simulations'], 120)
+    assert (holdings['value'][:, 3:] > 0).any()
+
+def test_simulate_portfolio_rejects_invalid_correlation():
+    """ Tests that a correlation matrix that is not positive definite raises a ValueError. """
+    bad = [[1.0, 0.99, -0.99], [0.99, 1.0, 0.99], [-0.99, 0.99, 1.0]]
+    with pytest.raises(ValueError):
+        simulate_portfolio({**ETF_INPUTS, 'asset_correlation': bad})
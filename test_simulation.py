@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from simulation import (
+    generate_draws, reuse_or_generate_draws, run_simulation, simulate_net_worth, survival_probability
+)
+from sensitivity import run_sensitivity
+from solver import solve_spending
+
+BASE_INPUTS = {
+    'initial_portfolio_value': 1000000,
+    'initial_cost_basis': 700000,
+    'annual_spending': 120000,
+    'monthly_passive_income': 1000,
+    'portfolio_annual_return': 0.10,
+    'portfolio_annual_std_dev': 0.19,
+    'quarterly_dividend_yield': 0.01,
+    'margin_loan_annual_avg_interest_rate': 0.06,
+    'margin_loan_annual_interest_rate_std_dev': 0.015,
+    'brokerage_margin_limit': 0.50,
+    'federal_tax_free_gain_limit': 123250,
+    'tax_harvesting_profit_threshold': 0.30,
+    'num_simulations': 300,
+    'seed': 7,
+}
+
+def test_run_simulation_is_reproducible_with_seed():
+    """ Tests that a seeded run produces identical aggregates and 120 months of results. """
+    results_a, paths_a = run_simulation(BASE_INPUTS)
+    results_b, _ = run_simulation(BASE_INPUTS)
+    assert len(results_a['avg_net_worth']) == 120
+    assert len(paths_a) == BASE_INPUTS['num_simulations']
+    for key in ('max_net_worth', 'avg_net_worth', 'min_net_worth'):
+        np.testing.assert_array_equal(results_a[key], results_b[key])
+
+def test_simulate_net_worth_broadcasts_parameters():
+    """ Tests that per-scenario parameter arrays match separate scalar runs on the same draws. """
+    draws = generate_draws(BASE_INPUTS)
+    n = BASE_INPUTS['num_simulations']
+    stacked_draws = {key: np.concatenate([value, value]) for key, value in draws.items()}
+    spending = np.repeat([100000.0, 150000.0], n)
+    stacked = simulate_net_worth({**BASE_INPUTS, 'annual_spending': spending}, stacked_draws)
+    low = simulate_net_worth({**BASE_INPUTS, 'annual_spending': 100000.0}, draws)
+    high = simulate_net_worth({**BASE_INPUTS, 'annual_spending': 150000.0}, draws)
+    np.testing.assert_allclose(stacked[:n], low)
+    np.testing.assert_allclose(stacked[n:], high)
+
+def test_reuse_or_generate_draws_only_redraws_on_distribution_change():
+    """ Tests that strategy edits and unused df values keep the cached draws. """
+    cached = reuse_or_generate_draws(BASE_INPUTS)
+    strategy_edit = {**BASE_INPUTS, 'tax_harvesting_profit_threshold': 0.5, 'return_distribution_df': 9}
+    assert reuse_or_generate_draws(strategy_edit, cached) is cached
+    fat_tails = {**BASE_INPUTS, 'return_distribution_model': "Student's t"}
+    assert reuse_or_generate_draws(fat_tails, cached) is not cached
+
+def test_solve_spending_meets_survival_target():
+    """ Tests that the solved spending meets the target and a slightly higher spending does not. """
+    draws = generate_draws(BASE_INPUTS)
+    solution = solve_spending(BASE_INPUTS, target_survival_probability=0.9, tolerance=50, draws=draws)
+    assert solution['feasible']
+    assert solution['survival_probability'] >= 0.9
+    above = simulate_net_worth({**BASE_INPUTS, 'annual_spending': solution['annual_spending'] + 100}, draws)
+    assert survival_probability(above) < 0.9
+
+def test_solve_spending_terminal_wealth_percentile():
+    """ Tests the terminal wealth percentile target. """
+    solution = solve_spending(
+        BASE_INPUTS, terminal_wealth_percentile=10, target_terminal_wealth=500000, tolerance=50
+    )
+    assert solution['feasible']
+    assert solution['terminal_wealth'] >= 500000
+
+def test_run_sensitivity_signs_and_order():
+    """ Tests that higher spending raises ruin risk and results are sorted by swing size. """
+    analysis = run_sensitivity(BASE_INPUTS, parameters=['annual_spending', 'tax_harvesting_profit_threshold'])
+    by_name = {s['parameter']: s for s in analysis['sensitivities']}
+    spending = by_name['annual_spending']
+    assert spending['ruin_probability_high'] >= spending['ruin_probability_low']
+    assert spending['median_terminal_net_worth_sensitivity'] < 0
+    swings = [abs(s['median_terminal_net_worth_high'] - s['median_terminal_net_worth_low'])
+              for s in analysis['sensitivities']]
+    assert swings == sorted(swings, reverse=True)
+
+def test_run_sensitivity_respects_input_bounds():
+    """ Tests that zero values get a one-sided step in their own units and bounds are never crossed. """
+    inputs = {**BASE_INPUTS, 'quarterly_dividend_yield': 0.0, 'monthly_passive_income': 0.0,
+              'brokerage_margin_limit': 0.995}
+    analysis = run_sensitivity(
+        inputs, parameters=['quarterly_dividend_yield', 'monthly_passive_income', 'brokerage_margin_limit']
+    )
+    by_name = {s['parameter']: s for s in analysis['sensitivities']}
+    assert by_name['quarterly_dividend_yield']['low_value'] == 0.0
+    assert 0 < by_name['quarterly_dividend_yield']['high_value'] < 0.01
+    assert by_name['monthly_passive_income']['low_value'] == 0.0
+    assert by_name['monthly_passive_income']['high_value'] == pytest.approx(100.0)
+    margin = by_name['brokerage_margin_limit']
+    assert margin['low_value'] < margin['base_value'] == margin['high_value']
+
+def test_run_sensitivity_rejects_unknown_parameter():
+    """ Tests that an empty list or an input outside the state machine raises a ValueError. """
+    with pytest.raises(ValueError):
+        run_sensitivity(BASE_INPUTS, parameters=['num_simulations'])
+    with pytest.raises(ValueError):
+        run_sensitivity(BASE_INPUTS, parameters=[])
+
+def test_run_sensitivity_ignores_repeated_parameters():
+    """ Tests that a repeated name is evaluated once and matches a single-name run. """
+    repeated = run_sensitivity(BASE_INPUTS, parameters=['annual_spending', 'annual_spending'])
+    single = run_sensitivity(BASE_INPUTS, parameters=['annual_spending'])
+    assert repeated == single